@@ -0,0 +1,280 @@
+"""
+Synthetic site generator
+
+Creates a Mambo site of a configurable size, to benchmark the build:
+    - pages, html and markdown, nested in directories
+    - SFC pages with a script and a scss style
+    - nested layouts, partials and macros
+    - a content_dir collection and a data_file collection
+    - large data/*.json files
+    - static assets
+
+The site is the same for the same arguments, so timings can be compared between runs.
+
+Usage:
+    python benchmarks/generate.py /tmp/bench-site --pages 500 --items 1000 --static 2000
+"""
+
+import os
+import json
+import random
+import shutil
+import click
+
+CONFIG = """
+site:
+  base_url: /
+  static_url: /static/
+  name: Benchmark
+  url: https://bench.example.com
+  meta:
+    keywords:
+    language: en-us
+    rating: General
+    robots: index, follow
+
+env:
+  prod:
+    base_url: /
+    static_url: /static/
+
+serve:
+  env:
+  generate_sitemap: True
+  minify_html: False
+  cache_busting:
+    enable: False
+
+build:
+  env: prod
+  generate_sitemap: True
+  minify_html: True
+  cache_busting:
+    enable: True
+    extensions:
+      - .css
+      - .js
+      - .png
+    ignore:
+
+globals:
+  layout: layouts/default.html
+  timezone: America/New_York
+  sitemap:
+    priority: 0.7
+    changefreq: monthly
+  assets:
+    scripts:
+      - js/main.js
+    stylesheets:
+      - css/main.css
+"""
+
+TEMPLATES = {
+    "layouts/base.html": """<!doctype html>
+<html lang="en">
+<head>
+    {% import "macros/meta.html" as meta %}
+    <meta charset="utf-8">
+    <title>{% block title %}{{ page.title }} | {{ site.name }}{% endblock %}</title>
+    {{ meta.tags(page, site) }}
+    {% for s in page.assets.stylesheets %}{{ stylesheet_tag(s.url) }}
+    {% endfor %}
+</head>
+<body>
+    {% include "partials/nav.html" %}
+    {% block body %}{% endblock %}
+    {% include "partials/footer.html" %}
+    {% for s in page.assets.scripts %}{{ script_tag(s.url, s.attributes) }}
+    {% endfor %}
+</body>
+</html>
+""",
+    "layouts/default.html": """{% extends "layouts/base.html" %}
+{% block body %}
+<main class="container">
+    {% block __PAGE_CONTENT__ %}{% endblock %}
+</main>
+{% endblock %}
+""",
+    "layouts/article.html": """{% extends "layouts/default.html" %}
+{% block __PAGE_CONTENT__ %}
+<article>
+    <h1>{{ page.title }}</h1>
+    <time>{{ format_date(page.date or 'now', 'MMMM D, YYYY') }}</time>
+    {{ super() }}
+</article>
+{% endblock %}
+""",
+    "partials/nav.html": """<nav>
+    <ul>
+        <li>{{ page_link('index', title='Home') }}</li>
+        <li>{{ page_link('blog', title='Blog') }}</li>
+        <li>{{ page_link('products', title='Products') }}</li>
+        {% for link in data.menu %}<li><a href="{{ link.url }}">{{ link.title }}</a></li>
+        {% endfor %}
+    </ul>
+</nav>
+""",
+    "partials/footer.html": """<footer>
+    <p>&copy; {{ site.name }} - {{ site.__generator__.name }} {{ site.__generator__.version }}</p>
+</footer>
+""",
+    "macros/meta.html": """{% macro tags(page, site) -%}
+    <meta name="description" content="{{ page.description }}">
+    {% for k, v in site.meta.items() %}{% if v %}<meta name="{{ k }}" content="{{ v }}">{% endif %}
+    {% endfor %}
+{%- endmacro %}
+"""
+}
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+         "exercitation ullamco laboris nisi aliquip ex ea commodo consequat").split()
+
+
+def write(filepath, content):
+    dest_dir = os.path.dirname(filepath)
+    if not os.path.isdir(dest_dir):
+        os.makedirs(dest_dir)
+    mode = "wb" if isinstance(content, bytes) else "w"
+    with open(filepath, mode) as f:
+        f.write(content)
+
+def text(rnd, words):
+    return " ".join(rnd.choice(WORDS) for _ in range(words))
+
+def markdown_body(rnd, paragraphs):
+    body = []
+    for i in range(paragraphs):
+        body.append("## %s\n" % text(rnd, 4).title())
+        body.append(text(rnd, 80) + "\n")
+        if i % 2 == 0:
+            body.append("- %s\n- %s\n- %s\n" % (text(rnd, 5), text(rnd, 5), text(rnd, 5)))
+        if i % 3 == 0:
+            body.append("```\n%s\n```\n" % text(rnd, 12))
+    return "\n".join(body)
+
+def html_body(rnd, paragraphs):
+    body = []
+    for _ in range(paragraphs):
+        body.append("<h2>%s</h2>" % text(rnd, 4).title())
+        body.append("<p>%s</p>" % text(rnd, 80))
+    body.append("{% for car in data.cars[:10] %}<div>{{ car.name }} - {{ car.price }}</div>{% endfor %}")
+    return "\n".join(body)
+
+def frontmatter(meta):
+    lines = ["---"]
+    for k, v in meta.items():
+        lines.append("%s: %s" % (k, json.dumps(v)))
+    lines.append("---\n")
+    return "\n".join(lines)
+
+def generate_site(dest, pages=100, items=100, data_items=1000, static=500, sfc=True, scss=True, seed=1):
+    '''
+    Generate a synthetic site
+    :param dest: the site dir. It is deleted first if it exists
+    :param pages: the number of pages
+    :param items: the number of items of each collection
+    :param data_items: the number of entries in each data file
+    :param static: the number of static files
+    :param sfc: bool, to make some pages single file components
+    :param scss: bool, to use scss in the SFC styles
+    :param seed: the random seed
+    '''
+    rnd = random.Random(seed)
+    if os.path.isdir(dest):
+        shutil.rmtree(dest)
+    os.makedirs(dest)
+
+    write(os.path.join(dest, "mambo.yml"), CONFIG)
+    for name, content in TEMPLATES.items():
+        write(os.path.join(dest, "templates", name), content)
+
+    # data
+    write(os.path.join(dest, "data", "menu.json"), json.dumps([
+        {"title": text(rnd, 2).title(), "url": "/menu-%s" % i} for i in range(10)
+    ]))
+    write(os.path.join(dest, "data", "cars.json"), json.dumps([
+        {"name": text(rnd, 3).title(), "price": rnd.randint(1000, 90000), "description": text(rnd, 40)}
+        for _ in range(data_items)
+    ]))
+    write(os.path.join(dest, "data", "products.json"), json.dumps([
+        {
+            "meta": {"title": text(rnd, 4).title(), "url": "product-%s" % i, "price": rnd.randint(1, 500)},
+            "content": markdown_body(rnd, 2),
+            "markup": "md"
+        }
+        for i in range(items)
+    ]))
+
+    # pages
+    write(os.path.join(dest, "pages", "index.html"),
+          frontmatter({"title": "Home"}) + html_body(rnd, 3))
+    write(os.path.join(dest, "pages", "blog.html"),
+          frontmatter({"title": "Blog", "collections": {"content_dir": "blog", "url": "blog/{url}", "per_page": 20}})
+          + '{% for item in page.collections %}<a href="{{ item.url }}">{{ item.title }}</a>{% endfor %}\n'
+          + "%%COLLECTION_CONTENT%%")
+    write(os.path.join(dest, "pages", "products.html"),
+          frontmatter({"title": "Products", "collections": {"data_file": "products", "url": "products/{url}"}})
+          + '{% for item in page.collections %}<a href="{{ item.url }}">{{ item.title }}</a>{% endfor %}\n'
+          + "%%COLLECTION_CONTENT%%")
+
+    for i in range(pages):
+        section = "section-%s" % (i % 10)
+        meta = {"title": text(rnd, 4).title(), "description": text(rnd, 12)}
+        if i % 3 == 0:
+            meta["layout"] = "layouts/article.html"
+        if i % 2 == 0:
+            filepath = os.path.join(dest, "pages", section, "page-%s.md" % i)
+            body = markdown_body(rnd, 6)
+        else:
+            filepath = os.path.join(dest, "pages", section, "page-%s.html" % i)
+            body = html_body(rnd, 6)
+        if sfc and i % 5 == 0:
+            if scss:
+                style = "$color: #%06x;\n.page-%s { color: $color; .title { font-weight: bold; } }" % (rnd.randint(0, 0xffffff), i)
+            else:
+                style = ".page-%s { color: #%06x; }\n.page-%s .title { font-weight: bold; }" % (i, rnd.randint(0, 0xffffff), i)
+            body = "<template>\n%s\n</template>\n<style%s>\n%s\n</style>\n<script>\nconsole.log('page %s');\n</script>\n" % (
+                body, " scss" if scss else "", style, i)
+        write(filepath, frontmatter(meta) + body)
+
+    # collection items
+    for i in range(items):
+        write(os.path.join(dest, "content", "blog", "post-%s.md" % i),
+              frontmatter({"title": text(rnd, 5).title(), "url": "post-%s" % i, "date": "2020-01-%02d" % (i % 28 + 1)})
+              + markdown_body(rnd, 4))
+
+    # static
+    write(os.path.join(dest, "static", "css", "main.css"), "body { margin: 0; }\n" * 200)
+    write(os.path.join(dest, "static", "js", "main.js"), "console.log('main');\n" * 200)
+    write(os.path.join(dest, "static", "_root", "robots.txt"), "User-agent: *\n")
+    for i in range(static):
+        kind = i % 3
+        if kind == 0:
+            write(os.path.join(dest, "static", "css", "c%s" % (i % 20), "s%s.css" % i), ".c%s { color: red; }\n" % i * 20)
+        elif kind == 1:
+            write(os.path.join(dest, "static", "js", "j%s" % (i % 20), "s%s.js" % i), "var s%s = %s;\n" % (i, i) * 20)
+        else:
+            write(os.path.join(dest, "static", "imgs", "i%s" % (i % 20), "s%s.png" % i), bytes(rnd.getrandbits(8) for _ in range(2048)))
+    return dest
+
+
+@click.command()
+@click.argument("dest")
+@click.option("--pages", type=int, default=100, help="Number of pages")
+@click.option("--items", type=int, default=100, help="Number of items of each collection")
+@click.option("--data-items", type=int, default=1000, help="Number of entries in the data files")
+@click.option("--static", type=int, default=500, help="Number of static files")
+@click.option("--no-sfc", is_flag=True, help="Don't create SFC pages")
+@click.option("--no-scss", is_flag=True, help="Don't use scss in the SFC pages")
+@click.option("--seed", type=int, default=1)
+def cmd(dest, pages, items, data_items, static, no_sfc, no_scss, seed):
+    """Generate a synthetic site in DEST"""
+    generate_site(dest, pages, items, data_items, static, not no_sfc, not no_scss, seed)
+    print("Site generated: %s" % dest)
+
+
+if __name__ == "__main__":
+    cmd()
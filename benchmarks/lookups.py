@@ -0,0 +1,145 @@
+"""
+Dotted lookups micro-benchmark
+
+Compares the dotted key lookups (dictdot.get) and the page helpers (page_url, page_link,
+page_info) against their previous implementation, which split the key, wrapped the
+page meta and rendered the link on each call:
+    get: dictdot.get('a.b.0.c') on a nested dict
+    template: a template calling page_url, page_link and page_info on every page
+
+Usage:
+    python benchmarks/lookups.py
+    python benchmarks/lookups.py /tmp/bench-site --number 5
+"""
+
+import os
+import sys
+import time
+import types
+import tempfile
+import click
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from mambo import Mambo, utils
+from generate import generate_site
+
+TEMPLATE = """
+{% for name in names %}
+{{ page_url(name) }} {{ page_link(name) }}
+{{ page_info(name, 'title') }} {{ page_info(name, 'description', '') }} {{ page_info(name, 'sitemap.priority') }}
+{{ page_info(name, 'assets.scripts.0.url') }} {{ page_info(name, 'missing.key', '-') }}
+{% endfor %}
+"""
+
+HELPERS = ["page_url", "page_link", "page_info"]
+
+
+class legacy_dictdot(dict):
+    ''' The previous dictdot.get, splitting the key on each call '''
+    def get(self, key, default=None):
+        try:
+            val = self
+            if "." not in key:
+                return self[key]
+            for k in key.split('.'):
+                if k.isdigit():
+                    k = int(k)
+                val = val[k]
+            return val
+        except (TypeError, KeyError, IndexError):
+            return default
+
+
+def legacy_page_info(self, filename, path, default_=None):
+    ''' The previous Mambo._fn_page_info, wrapping the meta in a dictdot on each call '''
+    page = self.pages_short_mapper.get(filename)
+    meta = self.pages[page]["meta"]
+    return legacy_dictdot(meta).get(path, default_)
+
+def legacy_page_url(self, filename, default_=""):
+    ''' The previous Mambo._fn_page_url, resolving the page on each call '''
+    return self._make_url(self._fn_page_info(filename, "url", default_))
+
+def legacy_page_link(self, filename, text=None, title=None, _class="", id="", alt="", **kwargs):
+    ''' The previous Mambo._fn_page_link, rendering the link on each call '''
+    anchor = ""
+    if "#" in filename:
+        filename, anchor = filename.split("#")
+        anchor = "#" + anchor
+    return "<a href='{url}' class='{_class}' id='{id}'  title=\"{title}\">{text}</a>".format(
+        url=self._fn_page_url(filename, "/") + anchor,
+        text=text or title or self._fn_page_info(filename, "title", title),
+        title=title or text or "",
+        _class=_class,
+        id=id
+    )
+
+def best(fn, number, repeat=5):
+    ''' Return the best time of `repeat` runs of `number` calls '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def bench_get(number):
+    data = {"a": {"b": [{"c": 1}], "x": 2}, "k": 3}
+    keys = ["k", "a.x", "a.b.0.c", "a.b.1.c", "a.missing"]
+    legacy = legacy_dictdot(data)
+    current = utils.dictdot(data)
+
+    def run(d):
+        def fn():
+            for k in keys:
+                d.get(k)
+        return fn
+    return best(run(legacy), number), best(run(current), number)
+
+def bench_template(site, number):
+    M = Mambo(site, {"build": "build"})
+    M.aggregate_pages_data()
+    names = sorted(M.pages_short_mapper.keys())
+    tpl = M.tpl_env.from_string(TEMPLATE)
+
+    def run(helpers):
+        # The helpers call each other through the instance
+        context = {}
+        for name, fn in helpers.items():
+            setattr(M, "_fn_%s" % name, fn)
+            context[name] = fn
+        return best(lambda: tpl.render(names=names, **context), number)
+
+    current = {name: getattr(M, "_fn_%s" % name) for name in HELPERS}
+    legacy = {name: types.MethodType(globals()["legacy_%s" % name], M) for name in HELPERS}
+    run(current)
+    legacy = run(legacy)
+    current = run(current)
+    return legacy, current, len(names)
+
+
+@click.command()
+@click.argument("site", required=False)
+@click.option("--number", type=int, default=3, help="Number of template renders per run")
+@click.option("--pages", type=int, default=500, help="Number of pages, when the site is generated")
+def cmd(site, number, pages):
+    """Benchmark the dotted lookups on SITE. A site is generated when SITE is missing"""
+    if not site:
+        site = os.path.join(tempfile.gettempdir(), "mambo-bench-lookups")
+        generate_site(site, pages=pages, items=10, static=0, sfc=False)
+    site = os.path.abspath(site)
+
+    legacy, current = bench_get(100000)
+    t_legacy, t_current, count = bench_template(site, number)
+
+    print("%-30s %10s %10s %8s" % ("Benchmark", "Before (s)", "Now (s)", "Speedup"))
+    print("%-30s %10.3f %10.3f %7.2fx" % ("dictdot.get x 500000", legacy, current, legacy / current))
+    print("%-30s %10.3f %10.3f %7.2fx" % ("template, %s pages x %s" % (count, number),
+                                          t_legacy, t_current, t_legacy / t_current))
+
+
+if __name__ == "__main__":
+    cmd()
@@ -0,0 +1,239 @@
+"""
+Benchmark runners
+
+Times the main build paths on a site, and records the peak memory (RSS):
+    build: a full build, Mambo.build()
+    build_incremental: an incremental build with nothing changed
+    aggregate: Mambo.aggregate_pages_data()
+    pages: building all the pages, create_page included, after the aggregation
+    serve_page, serve_layout, serve_data: the 'serve' rebuild when a page, a layout
+                                          or a data file changes
+
+Each runner is run in its own process, so the peak RSS is its own.
+
+Results can be saved as a baseline, and compared against it to find speedups and regressions.
+
+Usage:
+    python benchmarks/generate.py /tmp/bench-site --pages 500
+    python benchmarks/run.py /tmp/bench-site --save baseline.json
+    ... make changes ...
+    python benchmarks/run.py /tmp/bench-site --compare baseline.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import statistics
+import subprocess
+import click
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from mambo import Mambo
+from mambo.__about__ import __version__
+from generate import generate_site
+
+RUNNERS = ["build", "build_incremental", "aggregate", "pages", "serve_page", "serve_layout", "serve_data"]
+
+
+def peak_rss():
+    '''
+    Return the peak RSS of the current process in MB
+    '''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB on Linux
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+def touch(filepath):
+    '''
+    Change the content of a file, so its hash changes
+    :returns string: the original content, to restore it
+    '''
+    with open(filepath) as f:
+        content = f.read()
+    with open(filepath, "a") as f:
+        f.write("\n")
+    return content
+
+def clean(site):
+    build_dir = os.path.join(site, ".build")
+    if os.path.isdir(build_dir):
+        shutil.rmtree(build_dir)
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+def find_file(dir, ext):
+    ''' Return the first file with the extension in a dir, in a stable order '''
+    for root, dirs, files in os.walk(dir):
+        dirs.sort()
+        for f in sorted(files):
+            if f.endswith(ext) and not f.startswith("_"):
+                return os.path.join(root, f)
+    raise ValueError("No '%s' file in %s" % (ext, dir))
+
+def run_build(site, jobs):
+    clean(site)
+    return timed(lambda: Mambo(site, {"build": "build"}).build(jobs=jobs))
+
+def run_build_incremental(site, jobs):
+    Mambo(site, {"build": "build"}).build(incremental=True, jobs=jobs)
+    return timed(lambda: Mambo(site, {"build": "build"}).build(incremental=True, jobs=jobs))
+
+def run_aggregate(site, jobs):
+    M = Mambo(site, {"build": "build"})
+    return timed(M.aggregate_pages_data)
+
+def run_pages(site, jobs):
+    M = Mambo(site, {"build": "build"})
+    M.build_static()
+    M.aggregate_pages_data()
+    M.build_cache.begin()
+    return timed(lambda: M._build_pages_list(list(M.pages.keys())))
+
+def run_serve(site, filepath):
+    clean(site)
+    M = Mambo(site, {"build": "serve"})
+    M.build()
+    content = touch(filepath)
+    try:
+        return timed(lambda: M.build_changed([filepath]))
+    finally:
+        with open(filepath, "w") as f:
+            f.write(content)
+
+def run_serve_page(site, jobs):
+    return run_serve(site, find_file(os.path.join(site, "pages"), ".html"))
+
+def run_serve_layout(site, jobs):
+    return run_serve(site, os.path.join(site, "templates", "layouts", "default.html"))
+
+def run_serve_data(site, jobs):
+    return run_serve(site, find_file(os.path.join(site, "data"), ".json"))
+
+def run_child(site, runner, repeat, jobs):
+    '''
+    Run a runner in the current process
+    :returns dict: {"times": [...], "rss": MB}
+    '''
+    fn = globals()["run_%s" % runner]
+    times = [fn(site, jobs) for _ in range(repeat)]
+    return {"times": times, "rss": peak_rss()}
+
+def run_runner(site, runner, repeat, jobs):
+    '''
+    Run a runner in its own process
+    :returns dict: {"min", "median", "rss"}
+    '''
+    args = [sys.executable, os.path.abspath(__file__), site, "--child", runner, "--repeat", str(repeat)]
+    if jobs is not None:
+        args += ["--jobs", str(jobs)]
+    out = subprocess.run(args, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    # The result is the last line, the build may print before it
+    data = json.loads(out.strip().splitlines()[-1])
+    return {
+        "min": min(data["times"]),
+        "median": statistics.median(data["times"]),
+        "rss": data["rss"]
+    }
+
+def compare(results, baseline, threshold):
+    '''
+    Compare the results against a baseline
+    :returns list: lines of text, and a bool if there is a regression
+    '''
+    lines = ["%-20s %10s %10s %8s %10s %10s" % ("Runner", "Base (s)", "Now (s)", "Ratio", "Base MB", "Now MB")]
+    regression = False
+    for runner, r in results["runners"].items():
+        b = baseline["runners"].get(runner)
+        if not b:
+            continue
+        ratio = r["min"] / b["min"] if b["min"] else 0
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regression = True
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        lines.append("%-20s %10.3f %10.3f %7.2fx %10s %10s%s" % (
+            runner, b["min"], r["min"], ratio,
+            "%.1f" % b["rss"] if b["rss"] else "-",
+            "%.1f" % r["rss"] if r["rss"] else "-",
+            flag))
+    return lines, regression
+
+
+@click.command()
+@click.argument("site", required=False)
+@click.option("-r", "--runner", "runners", multiple=True, type=click.Choice(RUNNERS), help="Runners to run. Default all")
+@click.option("--repeat", type=int, default=3, help="Number of runs of each runner. The min is kept")
+@click.option("-j", "--jobs", type=int, default=None, help="Number of processes to build the pages with")
+@click.option("--pages", type=int, default=200, help="Number of pages, when the site is generated")
+@click.option("--items", type=int, default=200, help="Number of collection items, when the site is generated")
+@click.option("--static", type=int, default=1000, help="Number of static files, when the site is generated")
+@click.option("--no-scss", is_flag=True, help="Don't use scss, when the site is generated")
+@click.option("--save", default=None, help="Save the results as JSON, ie: as a baseline")
+@click.option("--compare", "compare_file", default=None, help="Baseline to compare the results against")
+@click.option("--threshold", type=float, default=0.1, help="Ratio above which a runner is a regression")
+@click.option("--child", default=None, help="Internal: run a runner in this process")
+def cmd(site, runners, repeat, jobs, pages, items, static, no_scss, save, compare_file, threshold, child):
+    """Benchmark the build of SITE. A site is generated when SITE is missing"""
+    if child:
+        print(json.dumps(run_child(site, child, repeat, jobs)))
+        return
+
+    site_info = None
+    if not site:
+        site = os.path.join(tempfile.gettempdir(), "mambo-bench-site")
+        site_info = {"pages": pages, "items": items, "static": static, "scss": not no_scss}
+        print("Generating site: %s" % site)
+        generate_site(site, pages=pages, items=items, static=static, scss=not no_scss)
+    site = os.path.abspath(site)
+
+    results = {
+        "mambo": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "site": site_info or site,
+        "jobs": jobs,
+        "repeat": repeat,
+        "runners": {}
+    }
+    print("%-20s %10s %10s %10s" % ("Runner", "Min (s)", "Median (s)", "Peak MB"))
+    for runner in runners or RUNNERS:
+        r = run_runner(site, runner, repeat, jobs)
+        results["runners"][runner] = r
+        print("%-20s %10.3f %10.3f %10s" % (runner, r["min"], r["median"], "%.1f" % r["rss"] if r["rss"] else "-"))
+
+    if save:
+        with open(save, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print("Results saved to: %s" % save)
+
+    if compare_file:
+        with open(compare_file) as f:
+            baseline = json.load(f)
+        lines, regression = compare(results, baseline, threshold)
+        print("")
+        for line in lines:
+            print(line)
+        if regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    cmd()
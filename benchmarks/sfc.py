@@ -0,0 +1,69 @@
+"""
+SFC and layout tokenizer micro-benchmark
+
+Compares the speed of the tokenizer of destruct_sfc and find_page_tags with the regex
+it replaces (utils.destruct_sfc_regex and utils.find_page_tags_regex), on large inputs:
+    page: a large SFC page, with its template, script and style
+    unclosed: a large SFC page with many unclosed <style tags, where the regex backtracks
+    layout: finding the extends tag and the __PAGE_CONTENT__ block of a large page without them
+
+The outputs are checked by tests/test_sfc.py
+
+Usage:
+    python benchmarks/sfc.py
+    python benchmarks/sfc.py --number 20 --size 50000
+"""
+
+import os
+import sys
+import time
+import click
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from mambo import utils
+
+
+def best(fn, number, repeat=5):
+    ''' Return the best time of `repeat` runs of `number` calls '''
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def large_inputs(size):
+    ''' Return the large inputs of the benchmark, by name '''
+    rows = "".join("<div class='row'><p>{{ item.title }} %s</p></div>\n" % i for i in range(size))
+    script = "".join("var a%s = \"%s\";\n" % (i, i) for i in range(size // 10))
+    style = "".join(".c%s { color: red; }\n" % i for i in range(size // 10))
+    page = "<template>\n%s</template>\n<script type='module'>\n%s</script>\n<style scoped>\n%s</style>\n" % (
+        rows, script, style)
+    unclosed = "<template>\n%s</template>\n%s" % (rows, "<style a='1'> .x{}\n" * (size // 50))
+    # Most pages have neither, create_page adds them
+    layout = rows.replace("<div", "{% if x %}<div").replace("</div>", "</div>{% endif %}")
+    return [
+        ("page", page, utils.destruct_sfc, utils.destruct_sfc_regex),
+        ("unclosed", unclosed, utils.destruct_sfc, utils.destruct_sfc_regex),
+        ("layout", layout, utils.find_page_tags, utils.find_page_tags_regex),
+    ]
+
+
+@click.command()
+@click.option("--number", type=int, default=10, help="Number of calls per run")
+@click.option("--size", type=int, default=20000, help="Number of rows of the large inputs")
+def cmd(number, size):
+    """Benchmark the SFC and layout tokenizer"""
+    print("%-30s %10s %10s %8s" % ("Benchmark", "Before (s)", "Now (s)", "Speedup"))
+    for name, content, fn, legacy_fn in large_inputs(size):
+        t_legacy = best(lambda: legacy_fn(content), number)
+        t_current = best(lambda: fn(content), number)
+        print("%-30s %10.3f %10.3f %7.2fx" % ("%s, %sKB x %s" % (name, len(content) // 1024, number),
+                                              t_legacy, t_current, t_legacy / t_current))
+
+
+if __name__ == "__main__":
+    cmd()
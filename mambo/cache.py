@@ -0,0 +1,301 @@
+"""
+Build cache
+
+Keeps the content hashes of the files used to build each page, along with the
+dependencies found while rendering, so an incremental build can skip the pages
+whose inputs didn't change.
+
+find_dependencies: Return the dependencies referenced in a parsed template
+BuildCache: The persistent cache
+BytecodeCache: Jinja bytecode cache, safe to share across build workers
+TextCache: Cache of converted texts, ie: Markdown or SCSS, in memory and on disk
+"""
+
+import os
+import json
+import hashlib
+import threading
+from jinja2 import nodes, FileSystemBytecodeCache
+from jinja2 import meta as jinja_meta
+from jinja2.utils import LRUCache
+
+# Bump when the format of the cache file changes
+CACHE_VERSION = 1
+
+# Template functions that read another page's meta
+PAGE_FUNCTIONS = ("page_url", "page_link", "page_info")
+
+# The attributes of 'data' that are its dict methods, not data files, ie: data.items()
+DATA_METHODS = frozenset(n for n in dir(dict) if not n.startswith("_"))
+
+
+def hash_bytes(data):
+    '''
+    returns the hex digest of bytes
+    :param data: bytes
+    '''
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+def hash_string(s):
+    '''
+    returns the hex digest of a string
+    :param s: string
+    '''
+    return hash_bytes(s.encode("utf-8"))
+
+def find_dependencies(ast):
+    '''
+    Return the dependencies referenced in a parsed template.
+    A dependency that can't be resolved statically (ie: a variable template
+    name) is returned as a wildcard, ie: 'template:*'
+    :param ast: jinja2.nodes.Template
+    :returns set: ie: {'template:layouts/default.html', 'data:cars', 'page:index'}
+    '''
+    deps = set()
+    for name in jinja_meta.find_referenced_templates(ast):
+        deps.add("template:%s" % name if name else "template:*")
+
+    # data.get('name.key'), the other methods read any data file
+    data_gets = {}
+    for node in ast.find_all(nodes.Call):
+        if isinstance(node.node, nodes.Getattr) and node.node.attr == "get" and node.args \
+                and isinstance(node.args[0], nodes.Const) and isinstance(node.args[0].value, str):
+            data_gets[id(node.node)] = "data:%s" % node.args[0].value.split(".")[0]
+
+    # data.name / data['name']
+    data_refs = 0
+    for node in ast.find_all((nodes.Getattr, nodes.Getitem)):
+        if isinstance(node.node, nodes.Name) and node.node.name == "data":
+            data_refs += 1
+            if isinstance(node, nodes.Getattr):
+                if node.attr in DATA_METHODS:
+                    deps.add(data_gets.get(id(node), "data:*"))
+                else:
+                    deps.add("data:%s" % node.attr)
+            elif isinstance(node.arg, nodes.Const):
+                deps.add("data:%s" % node.arg.value)
+            else:
+                deps.add("data:*")
+    data_names = [n for n in ast.find_all(nodes.Name) if n.name == "data" and n.ctx == "load"]
+    if len(data_names) > data_refs:
+        deps.add("data:*")
+
+    # page_url('name'), page_link('name'), page_info('name', ...)
+    for node in ast.find_all(nodes.Call):
+        if isinstance(node.node, nodes.Name) and node.node.name in PAGE_FUNCTIONS:
+            if node.args and isinstance(node.args[0], nodes.Const):
+                deps.add("page:%s" % str(node.args[0].value).split("#")[0])
+            else:
+                deps.add("page:*")
+    return deps
+
+
+class BuildCache(object):
+    '''
+    Persistent build cache, saved as JSON under the build dir.
+
+    Each page has a record:
+        fingerprint: hash of all its dependencies at build time
+        deps: list of the dependencies found while rendering
+        outputs: list of files created, relative to the build dir
+        manifest: list of the manifest entries created
+    '''
+
+    def __init__(self, filepath, key):
+        '''
+        :param filepath: the cache file
+        :param key: a hash of the config. A different key invalidates the cache
+        '''
+        self.filepath = filepath
+        self.key = key
+        self.files = {}
+        self.values = {}
+        self.pages = {}
+        self.static = []
+        self._previous_pages = {}
+
+    def load(self):
+        '''
+        Load the cache file
+        :returns bool: False if the cache is missing or invalid
+        '''
+        if not os.path.isfile(self.filepath):
+            return False
+        try:
+            with open(self.filepath) as f:
+                data = json.load(f)
+        except ValueError:
+            return False
+        if data.get("version") != CACHE_VERSION or data.get("key") != self.key:
+            return False
+        self.files = data.get("files", {})
+        self.values = data.get("values", {})
+        self.static = data.get("static", [])
+        self._previous_pages = data.get("pages", {})
+        self.pages = {}
+        return True
+
+    def clear(self):
+        ''' Delete the cache file and reset the records '''
+        if os.path.isfile(self.filepath):
+            os.remove(self.filepath)
+        self.files = {}
+        self.values = {}
+        self.pages = {}
+        self.static = []
+        self._previous_pages = {}
+
+    def save(self):
+        ''' Write the cache file '''
+        dest_dir = os.path.dirname(self.filepath)
+        if not os.path.isdir(dest_dir):
+            os.makedirs(dest_dir)
+        data = {
+            "version": CACHE_VERSION,
+            "key": self.key,
+            "values": self.values,
+            "files": self.files,
+            "static": self.static,
+            "pages": self.pages
+        }
+        tmp_file = self.filepath + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, default=str)
+        os.replace(tmp_file, self.filepath)
+
+    def file_hash(self, filepath):
+        '''
+        Return the content hash of a file.
+        The hash is reused as long as the size and mtime didn't change
+        :param filepath:
+        :returns string: None if the file doesn't exist
+        '''
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            self.files.pop(filepath, None)
+            return None
+        cached = self.files.get(filepath)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        with open(filepath, "rb") as f:
+            h = hash_bytes(f.read())
+        self.files[filepath] = [st.st_size, st.st_mtime_ns, h]
+        return h
+
+    def dir_hash(self, dirpath):
+        '''
+        Return a hash of all the files in a directory, recursively
+        :param dirpath:
+        :returns string: None if the directory doesn't exist
+        '''
+        if not os.path.isdir(dirpath):
+            return None
+        entries = []
+        for root, _, files in os.walk(dirpath):
+            for fname in files:
+                filepath = os.path.join(root, fname)
+                entries.append("%s:%s" % (filepath.replace(dirpath, ""), self.file_hash(filepath)))
+        return hash_string("\n".join(sorted(entries)))
+
+    def begin(self):
+        ''' Start a new pages build. The records of the last build become the previous ones '''
+        if self.pages:
+            self._previous_pages = self.pages
+            self.pages = {}
+
+    def get_page(self, name):
+        ''' Return the record of a page from the previous build '''
+        return self._previous_pages.get(name)
+
+    def set_page(self, name, record):
+        ''' Set the record of a page for the current build '''
+        self.pages[name] = record
+
+    def remove_page(self, name):
+        ''' Remove the record of a page from the current build and return it '''
+        return self.pages.pop(name, None)
+
+    def stale_page_outputs(self):
+        ''' Return the outputs of the previous build that are not created anymore '''
+        previous = set(o for r in self._previous_pages.values() for o in r["outputs"])
+        current = set(o for r in self.pages.values() for o in r["outputs"])
+        return sorted(previous - current)
+
+    def set_static(self, outputs):
+        '''
+        Set the static outputs of the current build
+        :returns list: the static outputs of the previous build that are not created anymore
+        '''
+        stale = sorted(set(self.static) - set(outputs))
+        self.static = list(outputs)
+        return stale
+
+
+class BytecodeCache(FileSystemBytecodeCache):
+    '''
+    Jinja bytecode cache on disk.
+    Files are written to a temp file then renamed, so a worker never loads
+    a half written file from another one
+    '''
+
+    def __init__(self, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+        super(BytecodeCache, self).__init__(directory)
+
+    def dump_bytecode(self, bucket):
+        filename = self._get_cache_filename(bucket)
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory, exist_ok=True)
+        tmp_file = "%s.%s.tmp" % (filename, os.getpid())
+        with open(tmp_file, "wb") as f:
+            bucket.write_bytecode(f)
+        os.replace(tmp_file, filename)
+
+
+class TextCache(object):
+    '''
+    Cache of converted texts by key, ie: the html of Markdown, the CSS of SCSS.
+    Kept in memory in a LRU, and on disk when a directory is set, so
+    unchanged texts are not converted again on the next builds
+    '''
+
+    # The extension of the files on disk
+    extension = ".txt"
+
+    def __init__(self, size, directory=None):
+        '''
+        :param size: the max number of texts in memory
+        :param directory: the dir of the disk cache. None to disable it
+        '''
+        self.memory = LRUCache(size)
+        self.directory = directory
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+
+    def _filepath(self, key):
+        return os.path.join(self.directory, key[:2], key + self.extension)
+
+    def get(self, key):
+        text = self.memory.get(key)
+        if text is None and self.directory:
+            try:
+                with open(self._filepath(key), encoding="utf-8") as f:
+                    text = f.read()
+            except (IOError, OSError):
+                return None
+            self.memory[key] = text
+        return text
+
+    def set(self, key, text):
+        self.memory[key] = text
+        if self.directory:
+            filepath = self._filepath(key)
+            dest_dir = os.path.dirname(filepath)
+            if not os.path.isdir(dest_dir):
+                os.makedirs(dest_dir, exist_ok=True)
+            tmp_file = "%s.%s.%s.tmp" % (filepath, os.getpid(), threading.get_ident())
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_file, filepath)
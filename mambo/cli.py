@@ -6,8 +6,8 @@ import click
 import logging
 import pkg_resources
 from livereload import Server, shell
-from . import Mambo
-from .mambo import PAGE_FORMAT
+from . import Mambo, utils
+from .mambo import PAGE_FORMAT, PROFILE_FILE
 from .__about__ import *
 
 
@@ -215,18 +215,36 @@ def create_page(pagenames):
 @cli.command("build")
 @click.option("-i", "--info", is_flag=True)
 @click.option("--env", default=None)
-def build(info, env):
+@click.option("--incremental", is_flag=True, default=None)
+@click.option("-j", "--jobs", type=int, default=None)
+@click.option("--async", "async_build", is_flag=True, default=None)
+@click.option("--profile", is_flag=True)
+@click.option("--profile-file", default=None)
+@click.option("--profile-top", type=int, default=10)
+def build(info, env, incremental, jobs, async_build, profile, profile_file, profile_top):
     """Build the site"""
     title("Building site...")
-    M = Mambo(CWD, {"env": env, "build": "build"})
+    M = Mambo(CWD, {"env": env, "build": "build", "profile": profile})
     log('Name: %s' % M.site_config.get('name'))
     log('Env: %s' % M.site_env)
     log('Base Url: %s' % M.base_url)
     log('Static Url: %s' % M.static_url) 
     log('Timezone: %s' % M.GLOBAL_TIMEZONE)  
     log('Sitemap: %s ' % ('Yes' if M.build_config.get('generate_sitemap') else 'No'))
+    log('Incremental: %s ' % ('Yes' if incremental or M.incremental else 'No'))
+    log('Workers: %s ' % (jobs if jobs is not None else M.workers))
+    log('Async: %s ' % ('Yes' if async_build or M.async_build else 'No'))
     log('')
-    M.build(print_info=info)
+    M.build(print_info=info, incremental=incremental or None, jobs=jobs, async_build=async_build or None)
+    if profile:
+        profile_file = profile_file or os.path.join(M.build_dir, PROFILE_FILE)
+        M.profiler.save(profile_file, top=profile_top)
+        log('')
+        log('Profile:')
+        for line in M.profiler.format_report(top=profile_top):
+            log(line)
+        log('')
+        log('Profile saved to: %s' % profile_file)
     done()
 
 @cli.command('serve')
@@ -252,20 +270,28 @@ def serve(port, no_livereload, open_url, env):
     log('Static Url: %s' % M.static_url)
     log("Livereload: %s" % ("OFF" if no_livereload else "ON"))
 
-    def build_static():
-        M.build_static()
+    server = Server()
+
+    watched_dirs = [M.static_dir, M.pages_dir, M.templates_dir, M.content_dir, M.data_dir]
+    snapshot = {}
+
+    # Only rebuild what depends on the files added, changed or removed since the last build,
+    # static files included
+    def build_changed():
+        current = utils.snapshot_files(watched_dirs)
+        filepaths = utils.diff_snapshots(snapshot, current)
+        snapshot.clear()
+        snapshot.update(current)
+        if filepaths:
+            M.build_changed(filepaths)
 
-    def build_pages():
-        M.build_pages()
- 
 
     M.build()
+    snapshot.update(utils.snapshot_files(watched_dirs))
 
-    server = Server()
     if no_livereload is False:
-        server.watch(M.static_dir + "/", build_static)
-        for c in [M.pages_dir, M.templates_dir, M.content_dir, M.data_dir]:
-            server.watch(c + "/", build_pages)
+        for c in watched_dirs:
+            server.watch(c + "/", build_changed)
 
     server.serve(open_url_delay=open_url, port=str(port), root=M.build_dir)
 
@@ -10,23 +10,38 @@ An elegant static site generator
 import os
 import re
 import sys
-import copy
 import json
+import types
+import math
 import time
+import gzip
 import yaml
 import arrow
 import shutil
 import jinja2
-import htmlmin
 import logging
+import asyncio
 import functools
+import itertools
+import collections
+import multiprocessing
+import concurrent.futures
 import frontmatter
 import pkg_resources
 from slugify import slugify
-from distutils.dir_util import copy_tree
 from .__about__ import *
 from . import utils
 from . import md_ext
+from . import scss_ext
+from . import minify
+from . import pipeline
+from .cache import BuildCache, BytecodeCache, find_dependencies, hash_string
+from .profiler import Profiler
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
 # ==============================================================================
@@ -39,12 +54,84 @@ CONFIG_FILE = "mambo.yml"
 # Acceptable files
 PAGE_FORMAT = (".html", ".md")
 
+# Data files: JSON, and JSON Lines (one item per line) for the large collections
+DATA_FORMAT = (".json", ".jsonl")
+
 # Default layout from the template folder
 DEFAULT_LAYOUT = "layouts/default.html"
 
+# The cache dir, relative to the build dir. It is kept when the build dir is pruned
+CACHE_DIR = ".cache"
+
+# The sitemap file, relative to the build dir
+SITEMAP_FILE = "sitemap.xml"
+
+# The sitemap files and their index, when the urls don't fit in one sitemap
+SITEMAP_PART_FILE = "sitemap-%s.xml"
+SITEMAP_INDEX_FILE = "sitemap_index.xml"
+
+# The limits of a sitemap file, from the sitemap protocol. The size is uncompressed
+SITEMAP_MAX_URLS = 50000
+SITEMAP_MAX_BYTES = 50 * 1024 * 1024
+
+# The build cache file, relative to the build dir
+BUILD_CACHE_FILE = ".cache/build.json"
+
+# The profile report of the build, relative to the build dir
+PROFILE_FILE = ".cache/profile.json"
+
+# The minify_assets setting the static files were copied with, relative to the build dir
+STATIC_STAMP_FILE = ".cache/static_stamp"
+
+# The Jinja bytecode cache dir, relative to the build dir
+BYTECODE_CACHE_DIR = ".cache/templates"
+
+# The converted Markdown cache dir, relative to the build dir
+MARKDOWN_CACHE_DIR = ".cache/markdown"
+
+# The compiled SCSS cache dir, relative to the build dir
+SCSS_CACHE_DIR = ".cache/scss"
+
+# Max number of compiled page templates to keep in memory
+TEMPLATE_CACHE_SIZE = 1000
+
+# Max number of parsed SFC contents to keep in memory
+SFC_CACHE_SIZE = 1000
+
+# The fields of the collection items in page.collections, page.prev and page.next.
+# More with meta.collections.fields
+COLLECTION_ITEM_FIELDS = ("url", "title", "date")
+
+# Max number of pages waiting to be minified and written, per html writer
+HTML_WRITES_PER_WORKER = 8
+
 # Tuple of the files that can be cached busted. They will be renamed when created
 STATIC_CACHE_BUST_CHECKSUM_FILE_TYPES = ('.js', '.css', '.svg', '.png', '.gif', '.jpg', '.jpeg')
 
+# Cache busting modes
+#   build: one random checksum for all the files, changed on each build
+#   content: a checksum of the content of each file
+CACHE_BUSTING_MODES = ("build", "content")
+
+# The manifest of the cache busted static files, relative to the build dir
+ASSETS_MANIFEST_FILE = "static/assets-manifest.json"
+
+# The dir of the bundled page assets, relative to the build static dir
+ASSETS_BUNDLES_DIR = "bundles__"
+
+# The scripts left out of the bundles: modules have their own scope, and src, async
+# and defer change how the script loads
+RE_UNBUNDLED_SCRIPT = re.compile(r'(?:^|\s)(?:(?:src|async|defer)(?=[\s=]|$)|type\s*=\s*["\']?module\b)', re.IGNORECASE)
+
+# The files to precompress, by extension
+PRECOMPRESS_EXTENSIONS = (".html", ".css", ".js", ".svg", ".xml", ".json")
+
+# The suffixes of the precompressed files
+PRECOMPRESS_SUFFIXES = (".gz", ".br")
+
+# Files smaller than this are not precompressed, in bytes
+PRECOMPRESS_MIN_SIZE = 256
+
 # Global timezone
 GLOBAL_TIMEZONE = 'America/New_York'
 
@@ -73,9 +160,14 @@ DEFAULT_PAGE_META = {
 DEFAULT_ENVIRONMENT = "dev"
 
 DEFAULT_JS_SCRIPT_TYPE = 'type="text/javascript"'
-RE_BLOCK_BODY = re.compile(r'{%\s*block\s+__PAGE_CONTENT__\s*%}')
+RE_BLOCK_BODY = utils.RE_BLOCK_BODY
 RE_BLOCK_BODY_PARSED = re.compile(r'{%\s*block\s+__PAGE_CONTENT__\s*%}(.*?){%\s*endblock\s*%}')
-RE_EXTENDS = re.compile(r'{%\s*extends\s+(.*?)\s*%}')
+RE_EXTENDS = utils.RE_EXTENDS
+# The line opening and closing the YAML frontmatter
+RE_FRONTMATTER_BOUNDARY = re.compile(r'^-{3,}$')
+
+# The C YAML loader, when PyYAML is built with libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
 # ==============================================================================
 
@@ -118,64 +210,239 @@ def gen_dest_file_and_url(filepath, page_meta={}):
     url = "/" + dest_file.lstrip("/").replace("index.html", "")
     return dest_file, url
 
+def new_page_meta():
+  '''
+  Return a new page meta with the defaults, the globals of the config included.
+  The nested dicts and lists are copied, the assets items are shared, they are only read
+  '''
+  meta = dict(DEFAULT_PAGE_META)
+  meta.update({
+    "meta": dict(DEFAULT_PAGE_META["meta"]),
+    "sitemap": dict(DEFAULT_PAGE_META["sitemap"]),
+    "assets": {
+      "scripts": list(DEFAULT_PAGE_META["assets"]["scripts"]),
+      "stylesheets": list(DEFAULT_PAGE_META["assets"]["stylesheets"])
+    }
+  })
+  return meta
+
+def read_frontmatter(filepath):
+  '''
+  Read only the YAML frontmatter of a markup file, the content is not read
+  :param filepath: the full path of the file
+  :returns tuple: (dict meta, the position of the content in the file).
+                  The position is None when the file has no YAML frontmatter
+  '''
+  with open(filepath) as f:
+      line = f.readline()
+      while line and not line.strip():
+          line = f.readline()
+      if not RE_FRONTMATTER_BOUNDARY.match(line.lstrip().rstrip("\n")):
+          return {}, None
+      lines = []
+      for line in iter(f.readline, ""):
+          if RE_FRONTMATTER_BOUNDARY.match(line.rstrip("\n")):
+              meta = yaml.load("".join(lines), Loader=YAML_LOADER)
+              return meta if isinstance(meta, dict) else {}, f.tell()
+          lines.append(line)
+      # Not closed, it's not a frontmatter
+      return {}, None
+
+def read_markup_content(filepath, position=0):
+  '''
+  Read the content of a markup file, after its frontmatter
+  :param filepath: the full path of the file
+  :param position: the position of the content, from read_frontmatter()
+  :returns string:
+  '''
+  with open(filepath) as f:
+      f.seek(position)
+      return f.read().strip()
+
+class MarkupFile(dict):
+    '''
+    A markup file from read_markup_file(). Its 'content' is read from the file
+    each time it is accessed, so only the meta is kept in memory
+    '''
+
+    def __init__(self, data, content_position):
+        '''
+        :param data: dict of the file properties
+        :param content_position: the position of the content in the file
+        '''
+        super(MarkupFile, self).__init__(data)
+        self.content_position = content_position
+
+    def __missing__(self, key):
+        if key == "content":
+            return read_markup_content(self["filepath"], self.content_position)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key == "content":
+            return self[key]
+        return super(MarkupFile, self).get(key, default)
+
 def read_markup_file(filepath, root=""):
   '''
-  Read a markup file (.html|.md) and return its property
+  Read a markup file (.html|.md) and return its property.
+  Only the frontmatter is read, the content is read when it is accessed
   :param filepath: the full path of the file
   :param root: the root path of filepath. It will be used to clean up
   :returns dict:
   '''
 
   markup = utils.get_ext(filepath)
-  basename = os.path.basename(filepath)
   basefile = filepath.replace(root, "")
-  with open(filepath) as f:
-      meta = copy.deepcopy(DEFAULT_PAGE_META)
-      sitemap = meta["sitemap"]
-      assets = meta["assets"]
-      _meta, content = frontmatter.parse(f.read())
-      if "sitemap" in _meta: 
-          sitemap.update(_meta["sitemap"])
-
-      if "assets" in _meta: 
-            _scripts = utils.convert_assets_items_to_dict(_meta["assets"].get("scripts"), DEFAULT_JS_SCRIPT_TYPE)
-            _stylesheets = utils.convert_assets_items_to_dict(_meta["assets"].get("stylesheets"))
-            assets["scripts"] += _scripts 
-            assets["stylesheets"] += _stylesheets 
-        
-      meta.update(_meta)
-      dest_file, url = gen_dest_file_and_url(basefile, meta)
-      if meta.get('url'): url = meta.get('url')
-
-      meta.update({
-        "url": url.lstrip('/').rstrip('/'), 
-        "filepath": dest_file,
-        "filedest": dest_file,
-        "basefile": basefile,
-        "markup": markup,
-        "sitemap": sitemap,
-        "assets": assets
-      })
-      return ({
-        "meta": meta, 
-        "content": content, 
-        "markup": markup
-        })
+  _meta, position = read_frontmatter(filepath)
+  content = None
+  if position is None:
+      # No YAML frontmatter, the other formats are left to frontmatter
+      with open(filepath) as f:
+          _meta, content = frontmatter.parse(f.read())
+
+  meta = new_page_meta()
+  sitemap = meta["sitemap"]
+  assets = meta["assets"]
+  if "sitemap" in _meta: 
+      sitemap.update(_meta["sitemap"])
+
+  if "assets" in _meta: 
+        _scripts = utils.convert_assets_items_to_dict(_meta["assets"].get("scripts"), DEFAULT_JS_SCRIPT_TYPE)
+        _stylesheets = utils.convert_assets_items_to_dict(_meta["assets"].get("stylesheets"))
+        assets["scripts"] += _scripts 
+        assets["stylesheets"] += _stylesheets 
+    
+  meta.update(_meta)
+  dest_file, url = gen_dest_file_and_url(basefile, meta)
+  if meta.get('url'): url = meta.get('url')
+
+  meta.update({
+    "url": url.lstrip('/').rstrip('/'), 
+    "filepath": dest_file,
+    "filedest": dest_file,
+    "basefile": basefile,
+    "markup": markup,
+    "sitemap": sitemap,
+    "assets": assets
+  })
+  data = {
+    "meta": meta, 
+    "markup": markup,
+    "filepath": filepath
+  }
+  if content is not None:
+      data["content"] = content
+  return MarkupFile(data, position or 0)
+
+# A page in the pages index. url is the full url, link the html of page_link without arguments
+PageRecord = collections.namedtuple("PageRecord", ["filename", "url", "title", "link"])
+
+PAGE_LINK_HTML = "<a href='{url}' class='{_class}' id='{id}'  title=\"{title}\">{text}</a>"
+
+class DataFiles(utils.dictdot):
+    '''
+    The data files by name, each one loaded when it is first accessed, ie: {{ data.cars }}
+    Loaded files are kept in a cache by path, and reused as long as their size and mtime don't change
+    '''
+
+    def __init__(self, paths, cache=None):
+        '''
+        :param paths: dict of the data files path by name, from get_data_files_paths()
+        :param cache: dict, the cache of the loaded files. Shared between instances to reuse the files
+        '''
+        super(DataFiles, self).__init__()
+        self._paths = paths
+        self._cache = {} if cache is None else cache
+
+    def __missing__(self, name):
+        if name not in self._paths:
+            raise KeyError(name)
+        value = load_data_file(self._paths[name], self._cache)
+        self[name] = value
+        return value
+
+    def __contains__(self, name):
+        return name in self._paths
 
-def get_data_files(dir):
-    data = {}
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def keys(self):
+        return self._paths.keys()
+
+    def values(self):
+        return [self[name] for name in self._paths]
+
+    def items(self):
+        return [(name, self[name]) for name in self._paths]
+
+def load_data_file(filepath, cache=None):
+    '''
+    Load a data file. JSON object are returned as dictdot, JSON Lines as a list
+    :param filepath:
+    :param cache: dict, to reuse the file loaded before when its size and mtime didn't change
+    '''
+    st = os.stat(filepath)
+    stamp = (st.st_size, st.st_mtime_ns)
+    if cache is not None and filepath in cache and cache[filepath][0] == stamp:
+        return cache[filepath][1]
+    if filepath.endswith(".jsonl"):
+        data = list(iter_data_file(filepath))
+    else:
+        with open(filepath) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = utils.dictdot(data)
+    if cache is not None:
+        cache[filepath] = (stamp, data)
+    return data
+
+def iter_data_file(filepath):
+    '''
+    Iterate over the items of a data file without loading it all:
+    JSON Lines, one item per line, or a JSON array with 'ijson' when installed
+    :param filepath:
+    :yield object:
+    '''
+    if filepath.endswith(".jsonl"):
+        with open(filepath) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    elif ijson is not None:
+        with open(filepath, "rb") as f:
+            for item in ijson.items(f, "item", use_float=True):
+                yield item
+    else:
+        for item in load_data_file(filepath):
+            yield item
+
+def get_data_files(dir, cache=None):
+    '''
+    Return the data files by name. They are loaded when accessed
+    :param dir: the data directory
+    :param cache: dict, the cache of the loaded files
+    :returns DataFiles:
+    '''
+    return DataFiles(get_data_files_paths(dir), cache)
+
+def get_data_files_paths(dir):
+    '''
+    Return the path of each data file, by name
+    :param dir: the data directory
+    :returns dict:
+    '''
+    paths = {}
     for root, _, files in os.walk(dir):
         for fname in files:
-            if fname.endswith((".json",)) and not fname.startswith(("_", ".")):
-                name = fname.replace(".json", "")
-                fname = os.path.join(root, fname)
-                if os.path.isfile(fname):
-                    with open(fname) as f:
-                        _ = json.load(f)
-                        if isinstance(_, dict):
-                            _ = utils.dictdot(_)
-                        data[name] = _
-    return utils.dictdot(data)
+            if fname.endswith(DATA_FORMAT) and not fname.startswith(("_", ".")):
+                paths[os.path.splitext(fname)[0]] = os.path.join(root, fname)
+    return paths
 
 def get_content_files_collection(dir):
   '''
@@ -190,30 +457,126 @@ def get_content_files_collection(dir):
       if os.path.isfile(fname):
         yield read_markup_file(fname, root=dir)
 
-def generate_sitemap(dir, manifest):
+class SitemapWriter(object):
+    '''
+    Write the urls of a sitemap as they come, without keeping the document in memory.
+    When the urls exceed the limits of a sitemap, they are split in sitemap-N.xml files,
+    listed in sitemap_index.xml. Files are only replaced when their content changed
+    '''
+
+    HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    FOOTER = '\n</urlset>'
+
+    def __init__(self, dir, base_url="/", max_urls=SITEMAP_MAX_URLS, max_bytes=SITEMAP_MAX_BYTES, compress=False):
+        '''
+        :param dir: the dir to write the sitemap in
+        :param base_url: the base url of the sitemap files, for the index
+        :param max_urls: the max number of urls in a file
+        :param max_bytes: the max size of a file, uncompressed
+        :param compress: bool, to gzip the sitemap files, ie: sitemap.xml.gz
+        '''
+        self.dir = dir
+        self.base_url = base_url
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.parts = []
+        self._file = None
+        self._raw_file = None
+        self._urls = 0
+        self._bytes = 0
+
+    def add(self, url):
+        '''
+        Write a url entry
+        :param url: string, the <url> element
+        '''
+        data = url.encode("utf-8")
+        if self._file is None \
+            or self._urls >= self.max_urls \
+            or self._bytes + len(data) + len(self.FOOTER) > self.max_bytes:
+            self._open_part()
+        self._file.write(data)
+        self._urls += 1
+        self._bytes += len(data)
+
+    def _open_part(self):
+        self._close_part()
+        tmp_file = os.path.join(self.dir, ".%s.tmp" % (SITEMAP_PART_FILE % (len(self.parts) + 1)))
+        self._raw_file = open(tmp_file, "wb")
+        self._file = self._raw_file
+        if self.compress:
+            self._file = gzip.GzipFile(filename="", mode="wb", fileobj=self._raw_file, mtime=0)
+        self.parts.append(tmp_file)
+        header = self.HEADER.encode("utf-8")
+        self._file.write(header)
+        self._urls = 0
+        self._bytes = len(header)
+
+    def _close_part(self):
+        if self._file is None:
+            return
+        self._file.write(self.FOOTER.encode("utf-8"))
+        self._file.close()
+        self._raw_file.close()
+        self._file = None
+        self._raw_file = None
+
+    def close(self):
+        '''
+        Finish the sitemap files and move them in place
+        :returns list: the files of the sitemap, relative to the dir
+        '''
+        if not self.parts:
+            self._open_part()
+        self._close_part()
+        ext = ".gz" if self.compress else ""
+        if len(self.parts) == 1:
+            files = [SITEMAP_FILE + ext]
+        else:
+            files = [SITEMAP_PART_FILE % (i + 1) + ext for i in range(len(self.parts))]
+        for tmp_file, f in zip(self.parts, files):
+            utils.replace_file(tmp_file, os.path.join(self.dir, f))
+
+        if len(files) > 1:
+            index = '<?xml version="1.0" encoding="UTF-8"?>\n'
+            index += '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            index += "".join("\t<sitemap>\n\t\t<loc>%s</loc>\n\t</sitemap>\n" % (self.base_url.rstrip("/") + "/" + f)
+                             for f in files)
+            index += '</sitemapindex>'
+            utils.write_file(os.path.join(self.dir, SITEMAP_INDEX_FILE), index)
+            files.append(SITEMAP_INDEX_FILE)
+        return files
+
+def generate_sitemap(dir, manifest, base_url="/", max_urls=SITEMAP_MAX_URLS, max_bytes=SITEMAP_MAX_BYTES, compress=False):
     '''
-    Generate a sitemap.xml file
+    Generate a sitemap.xml file, or sitemap-N.xml files and their sitemap_index.xml
+    when the urls exceed max_urls or max_bytes in a file
     :param dir: The base dir for the sitemap
     :param list: manifest of list of dict of pages
+    :param base_url: the base url of the sitemap files
+    :param max_urls: the max number of urls in a sitemap file
+    :param max_bytes: the max size of a sitemap file, uncompressed
+    :param compress: bool, to gzip the sitemap files
+    :returns list: the files of the sitemap, relative to dir
     '''
-    sitemap = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    sitemap += '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+    # The formatted lastmod dates, most pages share the same ones, ie: 'now'
+    lastmods = {}
+    writer = SitemapWriter(dir, base_url, max_urls, max_bytes, compress)
     for link in manifest:
         if link["sitemap"]["exclude"] is True:
             continue
 
-        lastmod = format_date(link["sitemap"]["lastmod"] if link["sitemap"]["lastmod"] else "now", "YYYY-MM-DD" )
-        sitemap += "\t<url>\n"
-        sitemap += "\t\t<loc>%s</loc>\n" % link["url"]   
-        sitemap += "\t\t<lastmod>%s</lastmod>\n" % lastmod   
-        sitemap += "\t\t<changefreq>%s</changefreq>\n" % link["sitemap"]["changefreq"]   
-        sitemap += "\t\t<priority>%s</priority>\n" % link["sitemap"]["priority"]  
-        sitemap += "\t</url>\n"    
-    sitemap += '\n</urlset>'
-
-    sitemapxml = os.path.join(dir, 'sitemap.xml')
-    with open(sitemapxml, 'w') as f:
-        f.write(sitemap)
+        lastmod = link["sitemap"]["lastmod"] or "now"
+        if lastmod not in lastmods:
+            lastmods[lastmod] = format_date(lastmod, "YYYY-MM-DD")
+        writer.add("\t<url>\n"
+                   "\t\t<loc>%s</loc>\n"
+                   "\t\t<lastmod>%s</lastmod>\n"
+                   "\t\t<changefreq>%s</changefreq>\n"
+                   "\t\t<priority>%s</priority>\n"
+                   "\t</url>\n" % (link["url"], lastmods[lastmod], link["sitemap"]["changefreq"], link["sitemap"]["priority"]))
+    return writer.close()
 
 # ==============================================================================
 
@@ -224,6 +587,7 @@ class Mambo(object):
     templates = {}
     pages = {}
     pages_short_mapper = {}
+    pages_index = {}
     manifest = []
     cache_busting_checksum = None
     _verbose = False
@@ -237,6 +601,7 @@ class Mambo(object):
         global GLOBAL_TIMEZONE
 
         self.root_dir = root_dir
+        self.options = options
         self.build_dir = os.path.join(self.root_dir, ".build")
         self.static_dir = os.path.join(self.root_dir, "static")
         self.content_dir = os.path.join(self.root_dir, "content")
@@ -246,8 +611,11 @@ class Mambo(object):
         self.build_static_dir = os.path.join(self.build_dir, "static")
         self.build_static_page_assets_dir = os.path.join(self.build_static_dir, "pages_assets__")
 
+        self.profiler = Profiler(enabled=options.get("profile") is True)
+
         self.config_file = os.path.join(self.root_dir, self.config_yml)
-        self.config = utils.load_conf(self.config_file)
+        with self.profiler.phase("config"):
+            self.config = utils.load_conf(self.config_file)
         self.config.setdefault("env", {}) 
         self.config.setdefault("serve", {}) 
         self.config.setdefault("build", {}) 
@@ -274,6 +642,7 @@ class Mambo(object):
 
 
         build_type = options.get("build", "build")
+        self.build_type = build_type
         self.build_config = utils.dictdot(self.config[build_type])
         site_env = self.build_config.get("env")
         if options and options.get("env") is not None: 
@@ -294,8 +663,94 @@ class Mambo(object):
 
         self.enable_cache_busting = self.build_config.get("cache_busting.enable") or False
         self.cache_busting_ignores = self.build_config.get("cache_busting.ignore") or []
+        self.cache_busting_mode = self.build_config.get("cache_busting.mode") or "build"
+        if self.cache_busting_mode not in CACHE_BUSTING_MODES:
+            raise ValueError("Cache busting Error: mode %s@%s must be one of %s" % (self.cache_busting_mode, build_type, ", ".join(CACHE_BUSTING_MODES)))
+        # Cache busted static files, by their path. Only for the 'content' mode
+        self.assets_manifest = {}
+
+        # Number of processes to build the pages with. 0 to use all the CPUs
+        workers = self.build_config.get("workers")
+        self.workers = 1 if workers is None else int(workers)
+
+        # Number of threads to copy the static files with. None for the default
+        self.static_workers = self.build_config.get("static_workers") or None
+        # Hardlink the static files instead of copying them, when on the same filesystem
+        self.static_links = self.build_config.get("static_links") is True
+
+        # Minify the CSS and JS of the static files and SFC
+        self.minify_assets = self.build_config.get("minify_assets") is True
+        # Minify the html of the pages: True for htmlmin, 'fast' for the faster minifier
+        minify_html = self.build_config.get("minify_html")
+        self.minify_html = "htmlmin" if minify_html is True else (minify_html or None)
+        if self.minify_html is not None and self.minify_html not in minify.HTML_MINIFY_ENGINES:
+            raise ValueError("Minify Error: minify_html@%s must be True, False or one of %s" % (build_type, ", ".join(minify.HTML_MINIFY_ENGINES)))
+        # Number of threads or processes to minify and write the html with, while the pages render.
+        # 0 to minify and write each page after rendering it
+        self.minify_html_workers = int(self.build_config.get("minify_html_workers") or 0)
+        self._html_writer = None
+        self._html_writes = collections.deque()
+        # Build with the async pipeline: the static files are copied while the pages are aggregated,
+        # and the pages are written by I/O workers from a bounded queue while the next pages render
+        self.async_build = self.build_config.get("async_build") is True
+        self.write_workers = int(self.build_config.get("write_workers") or pipeline.WRITE_WORKERS)
+        self.write_queue_size = int(self.build_config.get("write_queue_size") or pipeline.WRITE_QUEUE_SIZE)
+        self._write_queue = None
+        # Concatenate the local scripts and stylesheets of each page
+        self.bundle_assets = self.build_config.get("bundle_assets") is True
+        # SFC assets content of the page being built, by url, to bundle them
+        self._sfc_assets_contents = {}
+        # Parsed SFC, by filename and hash of the content, with their assets files.
+        # Cleared on each build and rebuild, as the imported .scss and the checksum may change
+        self._sfc_cache = jinja2.utils.LRUCache(SFC_CACHE_SIZE)
+        self._sfc_assets = None
+
+        # Write the gzip (and brotli) files of the text files
+        self.precompress = self.build_config.get("precompress.enable") is True
+
+        # The data files loaded, by path
+        self._data_cache = {}
+
+        # Incremental build
+        self.incremental = self.build_config.get("incremental") is True
+        self._incremental = False
+        self.build_cache = BuildCache(os.path.join(self.build_dir, BUILD_CACHE_FILE), self._build_cache_key())
+        self._current_deps = None
+        self._current_outputs = None
+        self._dep_hashes = {}
+        self._template_deps = {}
+
+        # Compiled page templates, by hash of their source
+        self.templates_cache = jinja2.utils.LRUCache(self.build_config.get("template_cache_size") or TEMPLATE_CACHE_SIZE)
+        self.enable_bytecode_cache = self.build_config.get("bytecode_cache") is True
+
+        # Converted Markdown, by hash of the text. Also kept on disk with 'build.markdown_cache'
+        md_ext.setup_cache(
+            self.build_config.get("markdown_cache_size") or md_ext.CACHE_SIZE,
+            os.path.join(self.build_dir, MARKDOWN_CACHE_DIR) if self.build_config.get("markdown_cache") is True else None
+        )
+
+        # Compiled SCSS, by hash of the source and its imports. Also kept on disk with 'build.scss_cache'
+        scss_ext.setup_cache(
+            self.build_config.get("scss_cache_size") or scss_ext.CACHE_SIZE,
+            os.path.join(self.build_dir, SCSS_CACHE_DIR) if self.build_config.get("scss_cache") is True else None
+        )
+        # Compile the static/**/*.scss files to .css
+        self.scss_static = self.build_config.get("scss_static") is True
+        # The files imported by each static .scss file compiled, by path
+        self._scss_imports = {}
+
         self.setup_jinja()
 
+    def _build_cache_key(self):
+        '''
+        The key of the build cache. Any change in the config or Mambo's version
+        invalidates the cache and triggers a full build
+        '''
+        with open(self.config_file) as f:
+            config = f.read()
+        return hash_string("\n".join([__version__, self.build_type, str(self.site_env), config]))
+
     def setup_jinja(self):
 
         filters = {
@@ -341,8 +796,12 @@ class Mambo(object):
             jinja2.FileSystemLoader(self.templates_dir)
         ]
 
+        bytecode_cache = None
+        if self.enable_bytecode_cache:
+            bytecode_cache = BytecodeCache(os.path.join(self.build_dir, BYTECODE_CACHE_DIR))
+
         loader = jinja2.ChoiceLoader(content_loaders) 
-        self.tpl_env = jinja2.Environment(loader=loader, extensions=env_extensions)
+        self.tpl_env = jinja2.Environment(loader=loader, extensions=env_extensions, bytecode_cache=bytecode_cache)
         self.tpl_env.globals.update(global_context)
         self.tpl_env.filters.update(filters)
     
@@ -350,14 +809,20 @@ class Mambo(object):
     # _fn_* helper method to be used in the jinja template
 
     def _fn_page_link(self, filename, text=None, title=None, _class="", id="", alt="", **kwargs):
-        """ Build the ahref to a page."""
+        """ Build the ahref to a page. Without arguments, the html is the one of the pages index """
+        if not (text or title or _class or id):
+            page = self.pages_index.get(filename)
+            if page is not None:
+                return page.link
+
         anchor = ""
         if "#" in filename:
             filename, anchor = filename.split("#")
             anchor = "#" + anchor
-        return "<a href='{url}' class='{_class}' id='{id}'  title=\"{title}\">{text}</a>".format(
-            url=self._fn_page_url(filename, "/") + anchor,
-            text=text or title or self._fn_page_info(filename, "title", title),
+        page = self.pages_index.get(filename)
+        return PAGE_LINK_HTML.format(
+            url=(page.url if page else self._make_url("/")) + anchor,
+            text=text or title or (page.title if page else title),
             title=title or text or "",
             _class=_class,
             id=id
@@ -369,13 +834,30 @@ class Mambo(object):
         if "#" in filename:
             filename, anchor = filename.split("#")
             anchor = "#" + anchor
-        return self._make_url(self._fn_page_info(filename, "url", default_))
+        page = self.pages_index.get(filename)
+        return (page.url if page else self._make_url(default_)) + anchor
 
     def _fn_page_info(self, filename, path, default_=None):
         '''Return the page meta info'''
-        page = self.pages_short_mapper.get(filename) 
-        meta = self.pages[page]["meta"]
-        return utils.dictdot(meta).get(path, default_)
+        page = self.pages_index.get(filename)
+        if page is None:
+            return default_
+        return utils.get_path(self.pages[page.filename]["meta"], path, default_)
+
+    def _index_pages(self):
+        '''
+        Build the pages index, used by page_url, page_link and page_info:
+        each short name of a page (with and without its extension) to its PageRecord
+        '''
+        records = {}
+        for filename, page in self.pages.items():
+            meta = page["meta"]
+            url = self._make_url(meta.get("url", ""))
+            title = meta.get("title")
+            link = PAGE_LINK_HTML.format(url=url, text=title, title="", _class="", id="")
+            records[filename] = PageRecord(filename, url, title, link)
+        self.pages_index = {name: records[filename] for name, filename in self.pages_short_mapper.items()
+                            if filename in records}
 
     def _fn_static_url(self, url):
         '''Returns the static url'''
@@ -386,6 +868,10 @@ class Mambo(object):
         if self.enable_cache_busting:
             if self.cache_busting_ignores and url in self.cache_busting_ignores:
                 url = url
+
+            elif self.cache_busting_mode == "content":
+                self._add_dependency("static:%s" % url.lstrip("/"))
+                url = self.assets_manifest.get(url.lstrip("/"), url)
             
             elif self.cache_busting_checksum and len(self.cache_busting_checksum) > 0:
                 url = utils.insert_checksum_in_filepath(url, self.cache_busting_checksum)
@@ -404,9 +890,29 @@ class Mambo(object):
     #----
 
     def _update_app_data(self):
-        self.data_files = get_data_files(self.data_dir)
+        with self.profiler.phase("data"):
+            self.data_files_paths = get_data_files_paths(self.data_dir)
+            # The files removed are not kept in the cache
+            paths = set(self.data_files_paths.values())
+            for filepath in list(self._data_cache):
+                if filepath not in paths:
+                    del self._data_cache[filepath]
+            self.data_files = DataFiles(self.data_files_paths, self._data_cache)
         self.tpl_env.globals.update({"data": self.data_files})
 
+    def _data_file_items(self, name):
+        '''
+        Iterate over the items of a data file, for a collection.
+        JSON Lines files, and JSON files when 'ijson' is installed, are streamed
+        :param name: the data file name
+        '''
+        filepath = self.data_files_paths.get(name)
+        if not filepath:
+            raise ValueError("Data file '%s' not found" % name)
+        if filepath.endswith(".jsonl") or ijson is not None:
+            return iter_data_file(filepath)
+        return iter(self.data_files[name])
+
     def _make_url(self, url):
         return self.base_url.rstrip("/") + "/" + url.lstrip("/")
 
@@ -415,76 +921,632 @@ class Mambo(object):
             shutil.rmtree(self.build_dir)
         os.makedirs(self.build_dir)
 
+    def prune_build_dir(self):
+        '''
+        Delete the files in the build dir that were not created by the last build.
+        The cache dir is kept
+        '''
+        outputs = set(self.build_cache.static)
+        outputs.update(o for r in self.build_cache.pages.values() for o in r["outputs"])
+        if self.build_config.get("generate_sitemap") is True:
+            outputs.update(self.build_cache.values.get("sitemap_files") or [SITEMAP_FILE])
+        for root, _, files in os.walk(self.build_dir, topdown=False):
+            base_dir = os.path.relpath(root, self.build_dir)
+            if base_dir == CACHE_DIR or base_dir.startswith(CACHE_DIR + os.sep):
+                continue
+            for f in files:
+                output = os.path.normpath(os.path.join(base_dir, f))
+                # Precompressed files are kept with their file
+                if self.precompress and f.endswith(PRECOMPRESS_SUFFIXES) and os.path.splitext(output)[0] in outputs:
+                    continue
+                if output not in outputs:
+                    print_info('removing stale file: %s...' % output, self._verbose)
+                    os.remove(os.path.join(root, f))
+            if root != self.build_dir and not os.listdir(root):
+                os.rmdir(root)
+
+    def precompress_build_dir(self):
+        '''
+        Write the gzip (and brotli when installed) files next to the text files of the build dir,
+        for the servers sending precompressed files, ie: nginx gzip_static.
+        Only the files that changed since the last build are compressed. The files that
+        compressing doesn't make smaller are recorded in the build cache, and skipped until they change
+        '''
+        print_info('precompressing files...', self._verbose)
+        extensions = tuple(self.build_config.get("precompress.extensions") or PRECOMPRESS_EXTENSIONS)
+        filepaths = []
+        for root, dirs, files in os.walk(self.build_dir):
+            if root == self.build_dir and CACHE_DIR in dirs:
+                dirs.remove(CACHE_DIR)
+            filepaths.extend(os.path.join(root, f) for f in files if f.endswith(extensions))
+
+        compressors = utils.get_compressors(self.build_config.get("precompress.brotli") is not False)
+        min_size = self.build_config.get("precompress.min_size")
+        min_size = PRECOMPRESS_MIN_SIZE if min_size is None else int(min_size)
+        # The files not compressed because it didn't make them smaller, and their hash then
+        skipped = {os.path.join(self.build_dir, f): h
+                   for f, h in (self.build_cache.values.get("precompress_skipped") or {}).items()}
+        utils.map_threads(lambda f: utils.precompress_file(f, compressors, min_size, skipped),
+                          filepaths, self.static_workers)
+        filepaths = set(filepaths)
+        self.build_cache.values["precompress_skipped"] = {
+            self._build_relpath(f): h for f, h in skipped.items() if os.path.splitext(f)[0] in filepaths}
+
     def build_static(self):
         ''' Build static files '''
         if not os.path.isdir(self.build_static_dir):
             os.makedirs(self.build_static_dir)
         print_info('copying static dir to build folder...', self._verbose)
         
-        # Cache Busting static assets
-        cache_busting_extensions = STATIC_CACHE_BUST_CHECKSUM_FILE_TYPES
-        _cache_busting_extensions = self.build_config.get("cache_busting.extensions")
-        if _cache_busting_extensions:
-            cache_busting_extensions = tuple(_cache_busting_extensions)
+        self.assets_manifest = {}
+        content_cache_busting = self.enable_cache_busting and self.cache_busting_mode == "content"
+
+        # The static files are only copied again when their mtime changes,
+        # all of them are when they were copied with another minify_assets setting
+        stamp_changed = self._static_stamp_changed()
+        if stamp_changed:
+            shutil.rmtree(self.build_static_dir)
+            os.makedirs(self.build_static_dir)
 
         _assets = utils.copy_static_dir(
             self.static_dir, 
             self.build_static_dir, 
-            self.cache_busting_checksum, 
-            cache_busting_extensions, 
-            self.cache_busting_ignores
+            self._static_file_checksum if content_cache_busting else self.cache_busting_checksum, 
+            self._cache_busting_extensions(), 
+            self.cache_busting_ignores,
+            self.assets_manifest if content_cache_busting else None,
+            workers=self.static_workers,
+            link=self.static_links,
+            transform=minify.get_minifier if self.minify_assets else None
         )
-        static_manifest = [a.replace(self.build_static_dir, "") for a in _assets]
-        
+        if self.scss_static:
+            _assets += self.build_static_scss()
+        if content_cache_busting:
+            _assets.append(self._write_assets_manifest())
+
         # static/_root contains files to be copied to the root the build directory
         _root_static = os.path.join(self.static_dir, '_root')
         if os.path.isdir(_root_static):
-            copy_tree(_root_static, self.build_dir)
+            _assets += utils.copy_dir(_root_static, self.build_dir, workers=self.static_workers, link=self.static_links)
+
+        if stamp_changed:
+            stamp_file = os.path.join(self.build_dir, STATIC_STAMP_FILE)
+            os.makedirs(os.path.dirname(stamp_file), exist_ok=True)
+            utils.write_file(stamp_file, self._static_stamp())
+
+        stale_outputs = self.build_cache.set_static([self._build_relpath(a) for a in _assets])
+        if self._incremental:
+            self._remove_outputs(stale_outputs)
+
+    def _static_stamp(self):
+        ''' The settings the static files are copied with '''
+        return "minify_assets" if self.minify_assets else ""
+
+    def _static_stamp_changed(self):
+        ''' Return True if the static files in the build dir were copied with other settings '''
+        stamp_file = os.path.join(self.build_dir, STATIC_STAMP_FILE)
+        if not os.path.isfile(stamp_file):
+            return True
+        with open(stamp_file) as f:
+            return f.read() != self._static_stamp()
+
+    def _cache_busting_extensions(self):
+        ''' Return the tuple of the static files extensions to cache bust '''
+        _cache_busting_extensions = self.build_config.get("cache_busting.extensions")
+        if _cache_busting_extensions:
+            return tuple(_cache_busting_extensions)
+        return STATIC_CACHE_BUST_CHECKSUM_FILE_TYPES
+
+    def _static_file_checksum(self, filepath):
+        ''' Return the checksum of a static file content, for cache busting '''
+        return self.build_cache.file_hash(filepath)[:8]
+
+    def _write_assets_manifest(self):
+        ''' Write the manifest of the cache busted static files. Returns its path '''
+        manifest_file = os.path.join(self.build_dir, ASSETS_MANIFEST_FILE)
+        utils.write_file(manifest_file, json.dumps(self.assets_manifest, indent=2, sort_keys=True))
+        return manifest_file
+
+    def _cache_busted_file(self, base_filepath, dest_file, checksum):
+        '''
+        Return the dest file of a static file, with a checksum when it is cache busted.
+        With the 'content' mode, the file is added to the assets manifest
+        :param base_filepath: the file relative to the static dir
+        :param dest_file: the file in the build dir
+        :param checksum: function returning the checksum of the content, for the 'content' mode
+        '''
+        if self.enable_cache_busting \
+            and base_filepath.endswith(self._cache_busting_extensions()) \
+            and base_filepath not in self.cache_busting_ignores:
+            if self.cache_busting_mode == "content":
+                _checksum = checksum()
+                self.assets_manifest[base_filepath] = utils.insert_checksum_in_filepath(base_filepath, _checksum)
+            else:
+                _checksum = self.cache_busting_checksum
+            dest_file = utils.insert_checksum_in_filepath(dest_file, _checksum)
+        return dest_file
+
+    def _static_scss_files(self):
+        ''' Return the .scss files of the static dir. Partials, starting with '_', are only imported '''
+        files = []
+        for root, dirs, fnames in os.walk(os.path.abspath(self.static_dir)):
+            dirs[:] = [d for d in dirs if not d.startswith(('.', '_'))]
+            files += [os.path.join(root, f) for f in fnames if f.endswith(".scss") and not f.startswith(('.', '_'))]
+        return sorted(files)
+
+    def _scss_dependents(self, filepaths):
+        '''
+        Return the static .scss files to compile again when .scss files changed:
+        the files themselves, and the ones importing them
+        :param filepaths: list of the .scss files changed
+        '''
+        changed = set(os.path.abspath(f) for f in filepaths)
+        return [f for f in self._static_scss_files()
+                if f in changed or not changed.isdisjoint(self._scss_imports.get(f, ()))]
+
+    def build_static_scss(self, filepaths=None):
+        '''
+        Compile the .scss files of the static dir to .css files in the build dir.
+        The files not in the SCSS cache are compiled in parallel.
+        A .scss file is skipped when the static dir has a .css file of the same name
+        :param filepaths: list of .scss files. None for all of them
+        :returns list: the .css files written
+        '''
+        if filepaths is None:
+            filepaths = self._static_scss_files()
+        filepaths = [f for f in filepaths if os.path.isfile(f) and not os.path.isfile(os.path.splitext(f)[0] + ".css")]
+        if not filepaths:
+            return []
+
+        sources = []
+        for filepath in filepaths:
+            with open(filepath, encoding="utf-8") as f:
+                sources.append((f.read(), [os.path.dirname(filepath), os.path.abspath(self.static_dir)]))
+        workers = self.workers if self.workers > 0 else multiprocessing.cpu_count()
+        with self.profiler.phase("scss"):
+            results = scss_ext.compile_strings(sources, workers)
+
+        outputs = []
+        for filepath, (css, imports) in zip(filepaths, results):
+            self._scss_imports[filepath] = imports
+            base_filepath = os.path.splitext(os.path.relpath(filepath, self.static_dir))[0] + ".css"
+            print_info('compiling scss file: %s...' % base_filepath, self._verbose)
+            if self.minify_assets:
+                css = self._minify_asset("css", css)
+            dest_file = self._cache_busted_file(base_filepath,
+                                                os.path.join(self.build_static_dir, base_filepath),
+                                                lambda: hash_string(css)[:8])
+            os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+            utils.write_file(dest_file, css)
+            outputs.append(dest_file)
+        return outputs
+
+    def build_static_files(self, filepaths):
+        '''
+        Copy only some files from the static dir to the build dir.
+        The static .scss files changed, and the ones importing them, are compiled again
+        :param filepaths: list of files in the static dir
+        :returns list: the .css files compiled again, relative to the static dir
+        '''
+        copied = False
+        for filepath in filepaths:
+            base_filepath = os.path.relpath(filepath, self.static_dir)
+            parts = base_filepath.split(os.sep)
+            if not os.path.isfile(filepath) or os.path.islink(filepath):
+                continue
+
+            # static/_root contains files to be copied to the root the build directory
+            if parts[0] == "_root":
+                dest_file = os.path.join(self.build_dir, *parts[1:])
+            elif any(p.startswith(('.', '_')) for p in parts):
+                continue
+            else:
+                dest_file = self._cache_busted_file(base_filepath,
+                                                    os.path.join(self.build_static_dir, base_filepath),
+                                                    lambda: self._static_file_checksum(filepath))
+
+            print_info('copying static file: %s...' % base_filepath, self._verbose)
+            os.makedirs(os.path.dirname(dest_file), exist_ok=True)
+            utils.copy_file(filepath, dest_file, self.static_links, minify.get_minifier(filepath) if self.minify_assets else None)
+            copied = True
+
+        compiled = []
+        if self.scss_static:
+            compiled = self._scss_dependents([f for f in filepaths if f.endswith(".scss")])
+            self.build_static_scss(compiled)
+        if self.enable_cache_busting and self.cache_busting_mode == "content" and (copied or compiled):
+            self._write_assets_manifest()
+        return [os.path.splitext(os.path.relpath(f, self.static_dir))[0] + ".css" for f in compiled]
 
     def build_pages(self):
-        self.aggregate_pages_data()
+        with self.profiler.phase("aggregate"):
+            self.aggregate_pages_data()
+        self._build_aggregated_pages()
+
+    def _build_aggregated_pages(self):
+        ''' Build the pages, once aggregated '''
+        self.build_cache.begin()
         print_info('initiating page building...', self._verbose)
-        [self._build_page(filename) for filename in self.pages.keys()]
+        filenames = [f for f in self.pages.keys() if not (self._incremental and self._reuse_page(f))]
+        with self.profiler.phase("pages"):
+            self._build_pages_list(filenames)
+        self._update_manifest()
+
+        if self._incremental:
+            self._remove_outputs(self.build_cache.stale_page_outputs())
+
+    def build_changed(self, filepaths):
+        '''
+        Rebuild only what depends on the changed files, using the dependencies
+        of the pages found in the last build. Used by 'serve'
+        :param filepaths: list of files changed in the pages, templates, content, data or static dir
+        :returns list: the pages rebuilt
+        '''
+        self._sfc_cache.clear()
+        static_files = []
+        deps = set()
+        filenames = set()
+        busted_urls = (self.enable_cache_busting and self.cache_busting_mode == "content") or self.bundle_assets
+        for filepath in filepaths:
+            filepath = os.path.abspath(filepath)
+            if self._is_in_dir(filepath, self.static_dir):
+                static_files.append(filepath)
+                # The urls of the cache busted files change with their content, bundles contain the files.
+                # SFC styles import the .scss files
+                if busted_urls or filepath.endswith(".scss"):
+                    deps.add("static:%s" % os.path.relpath(filepath, self.static_dir))
+                continue
+            if self._is_in_dir(filepath, self.pages_dir):
+                filename = self._reload_page(filepath)
+                if filename:
+                    filenames.add(filename)
+            deps.update(self._file_dependencies(filepath))
+
+        if static_files:
+            compiled = self.build_static_files(static_files)
+            if busted_urls:
+                deps.update("static:%s" % f for f in compiled)
+
+        if deps:
+            self._dep_hashes = {}
+            for dep in deps:
+                if dep.startswith("template:"):
+                    self._template_deps.pop(dep[len("template:"):], None)
+
+            # Match the pages depending on the files, or on any file of the same kind with a wildcard
+            deps.update(set(dep.split(":")[0] + ":*" for dep in deps))
+            for filename in self.pages.keys():
+                record = self.build_cache.pages.get(filename)
+                if not record or not deps.isdisjoint(self._expand_dependencies(record["deps"])):
+                    filenames.add(filename)
+
+        filenames = [f for f in self.pages.keys() if f in filenames]
+        if filenames:
+            previous_outputs = set(o for f in filenames if f in self.build_cache.pages
+                                   for o in self.build_cache.pages[f]["outputs"])
+            self._build_pages_list(filenames)
+            current_outputs = set(o for f in filenames for o in self.build_cache.pages[f]["outputs"])
+            self._remove_outputs(sorted(previous_outputs - current_outputs))
+            self._update_manifest()
+            if self.build_config.get("generate_sitemap") is True:
+                self.write_sitemap()
+        return filenames
+
+    def write_sitemap(self):
+        '''
+        Write the sitemap of the manifest, and delete the sitemap files of the previous build
+        that were not written again, ie: the sitemap was split, or is not split anymore
+        '''
+        files = generate_sitemap(
+            self.build_dir,
+            self.manifest,
+            base_url=self.base_url,
+            max_urls=int(self.build_config.get("sitemap.max_urls") or SITEMAP_MAX_URLS),
+            max_bytes=int(self.build_config.get("sitemap.max_bytes") or SITEMAP_MAX_BYTES),
+            compress=self.build_config.get("sitemap.gzip") is True
+        )
+        # A stale sitemap-1.xml has the name of the new sitemap-1.xml.gz as precompressed file
+        for stale in sorted(set(self.build_cache.values.get("sitemap_files") or []) - set(files)):
+            for f in (stale,) + tuple(stale + suffix for suffix in PRECOMPRESS_SUFFIXES):
+                if f not in files and os.path.isfile(os.path.join(self.build_dir, f)):
+                    print_info('removing stale file: %s...' % f, self._verbose)
+                    os.remove(os.path.join(self.build_dir, f))
+        self.build_cache.values["sitemap_files"] = files
+
+    def _is_in_dir(self, filepath, dir):
+        ''' Check if a file is in a directory '''
+        return filepath.startswith(dir.rstrip(os.sep) + os.sep)
+
+    def _file_dependencies(self, filepath):
+        '''
+        Return the dependencies matching a file
+        :param filepath: the full path of the file
+        :returns set:
+        '''
+        deps = set()
+        if self._is_in_dir(filepath, self.pages_dir):
+            base_filename = os.path.relpath(filepath, self.pages_dir)
+            deps.add("page:%s" % base_filename)
+            deps.add("page:%s" % os.path.splitext(base_filename)[0])
+        elif self._is_in_dir(filepath, self.templates_dir):
+            deps.add("template:%s" % os.path.relpath(filepath, self.templates_dir))
+        elif self._is_in_dir(filepath, self.content_dir):
+            base_filename = os.path.relpath(filepath, self.content_dir)
+            deps.add("template:content/%s" % base_filename)
+            # a collection depends on all the files of its content_dir
+            base_dir = os.path.dirname(base_filename)
+            while base_dir:
+                deps.add("content:%s" % base_dir)
+                base_dir = os.path.dirname(base_dir)
+        elif self._is_in_dir(filepath, self.data_dir):
+            self._update_app_data()
+            deps.add("data:%s" % os.path.splitext(os.path.basename(filepath))[0])
+        return deps
+
+    def _reload_page(self, filepath):
+        '''
+        Read again a page file that changed.
+        A page removed or not published anymore has its outputs deleted
+        :param filepath: the full path of the page
+        :returns string: the page filename, or None if it won't be built
+        '''
+        base_dir, f = os.path.split(os.path.relpath(filepath, self.pages_dir))
+        filename = os.path.join(base_dir, f)
+        if os.path.isfile(filepath) and self._add_page(base_dir, f):
+            self._index_pages()
+            return filename
+        self.pages.pop(filename, None)
+        self._index_pages()
+        record = self.build_cache.remove_page(filename)
+        if record:
+            self._remove_outputs(record["outputs"])
+        return None
+
+    def _pages_workers(self):
+        ''' Return the number of processes to build the pages with '''
+        return self.workers if self.workers > 0 else multiprocessing.cpu_count()
+
+    def _build_pages_list(self, filenames):
+        ''' Build a list of pages, in parallel when there are workers '''
+        workers = self._pages_workers()
+        if workers > 1 and len(filenames) > 1:
+            self._build_pages_parallel(filenames, workers)
+        else:
+            for filename in filenames:
+                self._build_page(filename)
+            self._wait_html_writes()
+
+    def _update_manifest(self):
+        ''' Keep the manifest in the pages order, whether they were built, reused or built by a worker '''
+        self.manifest = [entry for filename in self.pages.keys()
+                         if filename in self.build_cache.pages
+                         for entry in self.build_cache.pages[filename]["manifest"]]
+
+    def _reuse_page(self, filename):
+        '''
+        Reuse the page from the previous build if none of its dependencies changed
+        :returns bool: True if the page was reused
+        '''
+        record = self.build_cache.get_page(filename)
+        if not record or record["fingerprint"] != self._dependencies_fingerprint(record["deps"]):
+            return False
+        for output in record["outputs"]:
+            if not os.path.isfile(os.path.join(self.build_dir, output)):
+                return False
+        print_info('skipping unchanged page: %s...' % filename, self._verbose)
+        self.build_cache.set_page(filename, record)
+        return True
+
+    def _build_pages_parallel(self, filenames, workers):
+        '''
+        Build the pages across a pool of processes.
+        Each worker has its own Mambo instance and returns the build records of its pages
+        :param filenames: list of pages to build
+        :param workers: int, the number of processes
+        '''
+        workers = min(workers, len(filenames))
+        print_info('building %s pages with %s workers...' % (len(filenames), workers), self._verbose)
+        chunks = utils.chunk_list(filenames, int(math.ceil(len(filenames) / float(workers * 4))))
+        initargs = (
+            self.root_dir,
+            self.options,
+            self._verbose,
+            self.cache_busting_checksum,
+            self.assets_manifest,
+            self.site_config["__generator__"]["timestamp"],
+            self.pages,
+            self.pages_short_mapper
+        )
+        with multiprocessing.Pool(workers, _init_build_worker, initargs) as pool:
+            for records, timings in pool.imap_unordered(_build_pages_worker, chunks):
+                for filename, record in records:
+                    self.build_cache.set_page(filename, record)
+                if timings:
+                    self.profiler.merge(timings)
+
+    def _dependencies_fingerprint(self, deps):
+        ''' Return a hash of the current state of all the dependencies '''
+        return hash_string("\n".join(
+            "%s=%s" % (dep, self._dependency_hash(dep))
+            for dep in sorted(self._expand_dependencies(deps))
+        ))
+
+    def _expand_dependencies(self, deps):
+        ''' Add the templates included, imported or extended by the templates in deps '''
+        expanded = set()
+        stack = list(deps)
+        while stack:
+            dep = stack.pop()
+            if dep in expanded:
+                continue
+            expanded.add(dep)
+            if dep.startswith("template:") and dep != "template:*":
+                stack.extend(self._template_dependencies(dep[len("template:"):]))
+        return expanded
+
+    def _template_dependencies(self, name):
+        ''' Return the dependencies referenced by a template '''
+        if name not in self._template_deps:
+            try:
+                source, _, _ = self.tpl_env.loader.get_source(self.tpl_env, name)
+                self._template_deps[name] = find_dependencies(self.tpl_env.parse(source, name))
+            except jinja2.TemplateNotFound:
+                self._template_deps[name] = set()
+        return self._template_deps[name]
+
+    def _dependency_hash(self, dep):
+        '''
+        Return the hash of a dependency:
+            page:<name> -> the page file
+            template:<name> -> the template file, in /templates or /content when prefixed with 'content/'
+            data:<name> -> the data file
+            content:<dir> -> all the files in the /content directory
+            static:<name> -> the static file, its content makes the cache busted url and the bundles
+            <kind>:* -> all the files of that kind
+        '''
+        if dep not in self._dep_hashes:
+            kind, name = dep.split(":", 1)
+            h = None
+            if kind == "page":
+                if name == "*":
+                    h = self.build_cache.dir_hash(self.pages_dir)
+                elif name in self.pages_short_mapper:
+                    h = self.build_cache.file_hash(os.path.join(self.pages_dir, self.pages_short_mapper[name]))
+            elif kind == "template":
+                if name == "*":
+                    h = hash_string("%s:%s" % (self.build_cache.dir_hash(self.templates_dir),
+                                               self.build_cache.dir_hash(self.content_dir)))
+                elif name.startswith("content/"):
+                    h = self.build_cache.file_hash(os.path.join(self.content_dir, name[len("content/"):]))
+                else:
+                    h = self.build_cache.file_hash(os.path.join(self.templates_dir, name))
+            elif kind == "data":
+                if name == "*":
+                    h = self.build_cache.dir_hash(self.data_dir)
+                elif name in self.data_files_paths:
+                    h = self.build_cache.file_hash(self.data_files_paths[name])
+            elif kind == "content":
+                h = self.build_cache.dir_hash(os.path.join(self.content_dir, name))
+            elif kind == "static":
+                filepath = os.path.join(self.static_dir, name)
+                h = self.build_cache.file_hash(filepath)
+                # A .css compiled from a .scss file
+                if h is None and self.scss_static and name.endswith(".css"):
+                    h = self._scss_hash(os.path.splitext(filepath)[0] + ".scss")
+            self._dep_hashes[dep] = h
+        return self._dep_hashes[dep]
+
+    def _scss_hash(self, filepath):
+        ''' Return the hash of a static .scss file and of the files it imports '''
+        if not os.path.isfile(filepath):
+            return None
+        with open(filepath, encoding="utf-8") as f:
+            imports = scss_ext.find_imports(f.read(), [os.path.dirname(filepath), self.static_dir])
+        return hash_string(",".join(self.build_cache.file_hash(f) or "" for f in [filepath] + imports))
+
+    def _build_relpath(self, filepath):
+        ''' Return the path of a file relative to the build dir '''
+        return os.path.relpath(filepath, self.build_dir)
+
+    def _remove_outputs(self, outputs):
+        '''
+        Delete files from the build dir, along with the directories left empty.
+        Files still created by a page are kept, ie: the SFC assets shared by pages
+        :param outputs: list of files relative to the build dir
+        '''
+        in_use = set(o for r in self.build_cache.pages.values() for o in r["outputs"])
+        for output in outputs:
+            dest_file = os.path.join(self.build_dir, output)
+            if output in in_use or not os.path.isfile(dest_file):
+                continue
+            print_info('removing stale file: %s...' % output, self._verbose)
+            os.remove(dest_file)
+            for suffix in PRECOMPRESS_SUFFIXES:
+                if os.path.isfile(dest_file + suffix):
+                    os.remove(dest_file + suffix)
+            dest_dir = os.path.dirname(dest_file)
+            while dest_dir != self.build_dir and not os.listdir(dest_dir):
+                os.rmdir(dest_dir)
+                dest_dir = os.path.dirname(dest_dir)
 
     def aggregate_pages_data(self):
         self.pages = {}
         self.manifest = []
+        self._dep_hashes = {}
+        self._template_deps = {}
         self._update_app_data()
 
         print_info('aggregating pages files...', self._verbose)
 
         for root, _, files in os.walk(self.pages_dir):            
             base_dir = root.replace(self.pages_dir, "").lstrip("/")
-            if base_dir.startswith("_"): continue 
             for f in files:
-                if f.startswith(("_", ".")) or not f.endswith(PAGE_FORMAT): continue 
-                base_filename = os.path.join(base_dir, f)
-                fname, _ext = os.path.splitext(base_filename)
-                self.pages_short_mapper.update({fname: base_filename, base_filename: base_filename})
-                filename = os.path.join(base_dir, f)
-                filepath = os.path.join(root, f)
-                markup_file = read_markup_file(filepath, root=self.pages_dir)
+                self._add_page(base_dir, f)
+        self._index_pages()
 
-                # Don't publish pages with meta.publish is False
-                if markup_file.get("meta").get("publish") is False:
-                    continue
-
-                self.pages.update({
-                    filename: markup_file
-                })
+    def _add_page(self, base_dir, f):
+        '''
+        Read a page file and add it to the pages
+        :param base_dir: the dir of the page, relative to the pages dir
+        :param f: the file name
+        :returns bool: True if the page was added
+        '''
+        if base_dir.startswith("_"): return False
+        if f.startswith(("_", ".")) or not f.endswith(PAGE_FORMAT): return False
+        base_filename = os.path.join(base_dir, f)
+        fname, _ext = os.path.splitext(base_filename)
+        self.pages_short_mapper.update({fname: base_filename, base_filename: base_filename})
+        filename = os.path.join(base_dir, f)
+        filepath = os.path.join(self.pages_dir, base_dir, f)
+        with self.profiler.phase("frontmatter"):
+            markup_file = read_markup_file(filepath, root=self.pages_dir)
+
+        # Don't publish pages with meta.publish is False
+        if markup_file.get("meta").get("publish") is False:
+            return False
+
+        self.pages.update({
+            filename: markup_file
+        })
+        return True
 
     def _build_page(self, filename):
+        '''
+        Build a page and save its record in the build cache
+        '''
         filename = self.pages_short_mapper.get(filename) 
+        manifest_start = len(self.manifest)
+        self._current_deps = set(["page:%s" % filename])
+        self._current_outputs = []
+        try:
+            with self.profiler.phase("page", page=filename):
+                self._render_page(filename)
+            deps = sorted(self._current_deps)
+            self.build_cache.set_page(filename, {
+                "fingerprint": self._dependencies_fingerprint(deps),
+                "deps": deps,
+                "outputs": self._current_outputs,
+                "manifest": self.manifest[manifest_start:]
+            })
+        finally:
+            self._current_deps = None
+            self._current_outputs = None
+
+    def _render_page(self, filename):
         meta = self.pages[filename]["meta"]
         content = self.pages[filename]["content"]
 
+        self._sfc_assets_contents = {}
         sfc = self._parse_sfc_content(filename, content)
         page_assets = {
             "scripts": meta["assets"]["scripts"] + sfc["assets"]["scripts"],
             "stylesheets": meta["assets"]["stylesheets"] + sfc["assets"]["stylesheets"]
         } 
+        if self.bundle_assets:
+            page_assets = self._bundle_page_assets(page_assets)
         base_content = sfc["content"]
-        context = {"page": meta}
+        # A copy, the meta of the page is kept as read for the next builds (serve)
+        context = {"page": dict(meta)}
         context["page"]["assets"] = page_assets
         page = {
             "filepath": meta.get("filepath"),
@@ -507,18 +1569,36 @@ class Mambo(object):
             markup: html|md
         
         The page context page.collections will be exposed containing the list of items.
+        page.prev and page.next contain the previous and next items.
+        The items are read only summaries, with url, title, date and the fields of 'meta.collections.fields'
         
         Base page requirement:
             'meta.collections.url': Must exist, contains the url path for the collection
                 meta.collections.url: /blog/{url}
 
             '%%COLLECTION_CONTENT%%': must be placed to display the content of the item
+
+        Pagination:
+            'meta.collections.per_page': the number of items per index page
+            'meta.collections.paginate_url': the url of the index pages after the first one.
+                Default: {page url}/page/{page}
+                meta.collections.paginate_url: /blog/page/{page}
+
+            Index pages are created with the base page, with an empty %%COLLECTION_CONTENT%%.
+            The first index page is written at the url of the base page.
+            In index pages and items, page.collections contains only the items of the index page,
+            and page.pagination the index page info
         '''   
         if meta.get("collections"):
-            if meta.get("collections").get("data_file"):
-                data = self.data_files.get(meta["collections"]["data_file"]) 
+            content_dir = None
+            data_file = meta.get("collections").get("data_file")
+            if data_file:
+                data = self._data_file_items(data_file)
+                self._add_dependency("data:%s" % data_file)
             elif meta.get("collections").get("content_dir"):
-                data = get_content_files_collection(os.path.join(self.content_dir, meta["collections"]["content_dir"] ))
+                content_dir = os.path.join(self.content_dir, meta["collections"]["content_dir"])
+                data = get_content_files_collection(content_dir)
+                self._add_dependency("content:%s" % meta["collections"]["content_dir"])
             else: 
                 raise ValueError('Page collection: %s, missing data_file or content_dir ' % filename)
 
@@ -529,49 +1609,115 @@ class Mambo(object):
                 print("Page collection '%s' is missing 'url'" % filename)
             permalink = "/" + permalink.lstrip('/')
             
-            # hold data of all the items meta
-            collections = []
-            # hold data for all the pages to be rendered
-            collection_pages = []
-
-            # Aggregate
-            for d in data:
-                subpage = copy.deepcopy(page)
-                submeta = copy.deepcopy(meta)
-                submeta.update(d["meta"])
+            fields = COLLECTION_ITEM_FIELDS + tuple(f for f in meta["collections"].get("fields") or []
+                                                    if f not in COLLECTION_ITEM_FIELDS)
+            # hold the summary of each item, for page.collections
+            items = []
+            # hold the url and the source of each item, to render them in the second pass
+            collection_items = []
+
+            # Aggregate the items summaries only. The content is not kept in memory
+            for index, d in enumerate(data):
+                # The item meta over the base page meta, without copying them
+                item_meta = collections.ChainMap(d["meta"], meta)
 
                 # Don't publish pages with meta.publish is False
-                if submeta.get("publish") is False:
+                if item_meta.get("publish") is False:
                     continue
 
+                slug = permalink.format_map(item_meta)
+                url = slug.format_map(item_meta)
+                items.append(types.MappingProxyType({f: url if f == "url" else item_meta.get(f) for f in fields}))
+                collection_items.append((slug, url, d["filepath"] if content_dir else index))
+
+            per_page = int(meta.get("collections").get("per_page") or 0)
+            paginations = self._paginate_collection(meta, items, per_page) if per_page else []
+
+            # Render and write each item, reading its content again from the file
+            if not content_dir:
+                data = self._data_file_items(data_file)
+                position = -1
+            for i, (slug, url, d) in enumerate(collection_items):
+                if content_dir:
+                    with self.profiler.phase("frontmatter"):
+                        d = read_markup_file(d, root=content_dir)
+                else:
+                    # Move to the item in the data file, by its index
+                    index = d
+                    d = next(itertools.islice(data, index - position - 1, None))
+                    position = index
+
+                # Layer the item meta over the base page meta, in a copy for this item only.
+                # Nested values are shared, not copied, they are only read
+                submeta = dict(meta)
+                submeta.update(d["meta"])
+                submeta["url"] = url
+                submeta["assets"] = page_assets
+
                 # If the collection page is SFC, just grab the content only
                 sub_sfc = self._parse_sfc_content(submeta.get("filepath", "random"), d.get("content"), d.get("markup"))
-                sub_content = base_content.replace("%%COLLECTION_CONTENT%%", sub_sfc["content"])
-
-                slug = permalink.format(**submeta)
-                submeta["url"] = slug.format(**submeta)
-
-                sub_context = subpage.get('context')
-                sub_context = {"page": submeta}
-                sub_context["page"]["assets"] = page_assets
-                
-                subpage.update({
-                    "filepath": slug,
-                    "content": sub_content,
-                    "context": sub_context
+                submeta["prev"] = items[i - 1] if i > 0 else None
+                submeta["next"] = items[i + 1] if i + 1 < len(items) else None
+                if paginations:
+                    submeta["pagination"] = paginations[i // per_page]
+                    submeta["collections"] = submeta["pagination"]["items"]
+                else:
+                    submeta["collections"] = items
+                self.create_page(
+                    filepath=slug,
+                    context={"page": submeta},
+                    content=base_content.replace("%%COLLECTION_CONTENT%%", sub_sfc["content"]),
+                    layout=page["layout"]
+                )
+
+            # Index pages
+            for pagination in paginations:
+                index_meta = dict(meta)
+                index_meta.update({
+                    "url": pagination["url"],
+                    "collections": pagination["items"],
+                    "pagination": pagination
                 })
-
-                collections.append(submeta)
-                collection_pages.append(subpage)
-
-            for page in collection_pages: 
-                page["context"]["page"]["collections"] = collections
-                self.create_page(**page)
+                self.create_page(
+                    filepath=meta["filepath"] if pagination["page"] == 1 else pagination["url"],
+                    context={"page": index_meta},
+                    content=base_content.replace("%%COLLECTION_CONTENT%%", ""),
+                    layout=page["layout"]
+                )
 
         # NORMAL PAGE
         else:
             self.create_page(**page)
 
+    def _paginate_collection(self, meta, items, per_page):
+        '''
+        Split the items of a collection into index pages
+        :param meta: the base page meta
+        :param items: list of the items summaries
+        :param per_page: int, number of items per index page
+        :returns list: list of dict, the pagination of each index page
+        '''
+        url = meta.get("collections").get("paginate_url")
+        if not url:
+            url = meta["url"].rstrip('/').lstrip('/') + "/page/{page}"
+        url = "/" + url.lstrip('/')
+
+        # The first index page is the base page, at its own url
+        chunks = utils.chunk_list(items, per_page)
+        urls = ["/" + meta["url"].strip('/')] + [url.format(page=i + 1) for i in range(1, len(chunks))]
+        return [{
+            "page": i + 1,
+            "pages": len(chunks),
+            "per_page": per_page,
+            "total": len(items),
+            "items": chunk,
+            "url": urls[i],
+            "prev_url": urls[i - 1] if i > 0 else None,
+            "next_url": urls[i + 1] if i + 1 < len(chunks) else None,
+            "first_url": urls[0],
+            "last_url": urls[-1]
+        } for i, chunk in enumerate(chunks)]
+
     def create_page(self, filepath, context={}, content=None, layout=None):
         '''
         To dynamically create a page and save it in the build_dir
@@ -607,7 +1753,7 @@ class Mambo(object):
         dest_file = os.path.join(build_dir, filepath)
         dest_dir = os.path.dirname(dest_file)
         if not os.path.isdir(dest_dir):
-            os.makedirs(dest_dir)
+            os.makedirs(dest_dir, exist_ok=True)
 
         
         '''
@@ -615,17 +1761,19 @@ class Mambo(object):
         The layout must contain __PAGE_CONTENT__ block
         ie: {% extends 'layouts/default.html' %}
         '''
-        if re.search(RE_EXTENDS, content) is None:
+        _layout_block, template, has_block = utils.find_page_tags(content)
+        if _layout_block is None:
             layout = layout or self.layout
-            content = "\n{% extends '{}' %} \n\n".replace("{}", layout) + content
+            _extends = "\n{% extends '{}' %} \n\n".replace("{}", layout)
+            content = _extends + content
+            _layout_block, template, _ = utils.find_page_tags(_extends)
 
         '''
         Wrap the block __PAGE_CONTENT__ around the content
         Must be invoked in the layout
         ie: {% block __PAGE_CONTENT__ %}{% endblock %}
         '''
-        if re.search(RE_BLOCK_BODY, content) is None:
-            _layout_block = re.search(RE_EXTENDS, content).group(0)
+        if not has_block:
             content = content.replace(_layout_block, "")
             _content = "\n" + _layout_block + "\n"
             _content += "{% block __PAGE_CONTENT__ %} \n" 
@@ -636,62 +1784,175 @@ class Mambo(object):
 
         print_info('creating page: %s...' % filepath, self._verbose)
 
+        # The layout the page extends, to group the timings by template
+        template = template.strip("'\"") if self.profiler.enabled else None
+
+        tpl, deps = self._compile_template(content, template)
+        if self._current_deps is not None:
+            self._current_deps.update(deps)
+        self._add_output(dest_file)
+
         # Write file
-        with open(dest_file, "w") as fw:
-            tpl = self.tpl_env.from_string(content)
+        with self.profiler.phase("render", template=template):
             render_content = tpl.render(**context)
-            if self.build_config.get("minify_html") is True:
-                render_content = htmlmin.minify(render_content, keep_pre=True)
-            fw.write(render_content)
+        if self.minify_html and self.minify_html_workers > 0:
+            self._write_html_async(dest_file, render_content)
+        else:
+            if self.minify_html:
+                with self.profiler.phase("minify"):
+                    render_content = minify.get_html_minifier(self.minify_html)(render_content)
+            self._write_page(dest_file, render_content)
+
+    def _write_page(self, dest_file, content):
+        ''' Write a page, with the I/O workers of the async pipeline when it runs '''
+        with self.profiler.phase("write"):
+            if self._write_queue is not None:
+                self._write_queue.put(dest_file, content)
+            else:
+                utils.write_file(dest_file, content)
+
+    def _write_html_async(self, dest_file, content):
+        '''
+        Minify and write a page with the html writers, while the next pages render.
+        The writers are processes, or threads in a build worker as its processes can't have children.
+        The number of pages waiting is bounded, to bound the memory
+        '''
+        if self._html_writer is None:
+            if multiprocessing.current_process().daemon:
+                self._html_writer = concurrent.futures.ThreadPoolExecutor(self.minify_html_workers)
+            else:
+                self._html_writer = concurrent.futures.ProcessPoolExecutor(self.minify_html_workers)
+        while len(self._html_writes) >= self.minify_html_workers * HTML_WRITES_PER_WORKER:
+            self._html_writes.popleft().result()
+        self._html_writes.append(self._html_writer.submit(_write_html, dest_file, content, self.minify_html))
+
+    def _wait_html_writes(self, close=False):
+        '''
+        Wait for the pages being minified and written
+        :param close: bool, to stop the html writers
+        '''
+        with self.profiler.phase("minify"):
+            while self._html_writes:
+                self._html_writes.popleft().result()
+        if close and self._html_writer is not None:
+            self._html_writer.shutdown()
+            self._html_writer = None
+
+    def _compile_template(self, source, template=None):
+        '''
+        Compile the source of a page once.
+        Compiled templates are kept in a LRU cache by hash of the source, and
+        their bytecode in the bytecode cache when enabled
+        :param source: string
+        :param template: the layout name, for the profiler
+        :returns tuple: (jinja2.Template, set of dependencies)
+        '''
+        key = hash_string(source)
+        compiled = self.templates_cache.get(key)
+        if compiled is not None:
+            return compiled
+
+        with self.profiler.phase("compile", template=template):
+            env = self.tpl_env
+            ast = env.parse(source)
+            if env.bytecode_cache is None:
+                tpl = env.from_string(ast)
+            else:
+                bucket = env.bytecode_cache.get_bucket(env, key, None, source)
+                if bucket.code is None:
+                    bucket.code = env.compile(ast)
+                    env.bytecode_cache.set_bucket(bucket)
+                tpl = env.template_class.from_code(env, bucket.code, env.make_globals(None), None)
+        compiled = (tpl, find_dependencies(ast))
+        self.templates_cache[key] = compiled
+        return compiled
 
     def _parse_sfc_content(self, filename, content, markup=None):
-        sfc = utils.destruct_sfc(content)
-        content = sfc[1].get('template')
-        markup = markup if markup else utils.get_ext(filename)
-        if markup == "md":
-            content = md_ext.convert(content)
-        assets = self._parse_sfc_assets(filename, sfc)
-        return {"content": content, "assets": assets}
+        '''
+        Parse the content of a page or collection item, SFC or not.
+        The result is kept by filename and hash of the content, so the same content
+        is parsed and its assets written once per build, ie: in each collection item
+        :returns dict: {content, assets}
+        '''
+        key = (filename, markup, hash_string(content or ""))
+        parsed = self._sfc_cache.get(key)
+        if parsed is None:
+            self._sfc_assets = []
+            try:
+                with self.profiler.phase("sfc"):
+                    sfc = utils.destruct_sfc(content)
+                content = sfc[1].get('template')
+                markup = markup if markup else utils.get_ext(filename)
+                if markup == "md":
+                    with self.profiler.phase("markdown"):
+                        content = md_ext.convert(content)
+                assets = self._parse_sfc_assets(filename, sfc)
+                parsed = ({"content": content, "assets": assets}, self._sfc_assets)
+            finally:
+                self._sfc_assets = None
+            # Only SFC are kept, the other contents are parsed again
+            if sfc[0] is True:
+                self._sfc_cache[key] = parsed
+        else:
+            # The files may have been removed with the outputs of another page
+            for asset_filename, file_fullpath, asset_content, deps in parsed[1]:
+                if not os.path.isfile(file_fullpath):
+                    utils.write_file(file_fullpath, asset_content)
+
+        for asset_filename, file_fullpath, asset_content, deps in parsed[1]:
+            self._add_output(file_fullpath)
+            for dep in deps:
+                self._add_dependency(dep)
+            self._sfc_assets_contents[asset_filename] = asset_content
+        return parsed[0]
 
     def _parse_sfc_assets(self, filename, sfc):
+        '''
+        Write the script and style of a SFC to static files, named by hash of their content,
+        so identical scripts and styles share the same file and url
+        '''
         assets = {"scripts": [], "stylesheets": []}
         # to add to _context["page"]["assets"]
         if sfc[0] is True:
             if not os.path.isdir(self.build_static_page_assets_dir):
-                os.makedirs(self.build_static_page_assets_dir)
+                os.makedirs(self.build_static_page_assets_dir, exist_ok=True)
             sfc_c = sfc[1]
-            sfc_hash = utils.gen_random_str()
-            filepath = slugify(filename)
             sfc_o = {"script": "js", "style": "css"}
 
             for o in sfc_o:
                 if (sfc_c.get(o)):
+                    content = sfc_c.get(o)
+                    content = content.replace('[[__STATIC_URL__]]', self.static_url.rstrip("/"))
+                    deps = []
+
+                    '''
+                    For stylesheet, if the tag contains 'scss' attribute, 
+                    convert scss to css
+                    '''
+                    if o == 'style' and "scss" in sfc_c["style_props"].strip():
+                        static_dir = os.path.abspath(self.static_dir)
+                        with self.profiler.phase("scss"):
+                            content, imports = scss_ext.compile_string(content, [static_dir])
+                        deps = ["static:%s" % os.path.relpath(f, static_dir) for f in imports if self._is_in_dir(f, static_dir)]
+
+                    if self.minify_assets:
+                        content = self._minify_asset(sfc_o[o], content)
 
                     '''
-                    For cache busting, don't put the checksum the engine will include it automatically.
-                    Non cache busting will include one
+                    The file is named by the hash of its content, so its url changes with it.
+                    For cache busting, don't put the checksum in the url, the engine will include it
+                    automatically. The 'content' mode leaves the url as is
                     '''
-                    file_basename = os.path.join(self.build_static_page_assets_dir, "%s.%s" % (filepath, sfc_o[o]))
-                    if self.cache_busting_checksum:
+                    file_basename = os.path.join(self.build_static_page_assets_dir, "%s.%s" % (hash_string(content)[:16], sfc_o[o]))
+                    file_fullpath = file_basename
+                    if self.cache_busting_checksum and not (self.enable_cache_busting and self.cache_busting_mode == "content"):
                         file_fullpath = utils.insert_checksum_in_filepath(file_basename, self.cache_busting_checksum)
-                    else:
-                        file_basename = utils.insert_checksum_in_filepath(file_basename, sfc_hash)
-                        file_fullpath = file_basename
 
                     # Cleanup the filename to use the relative path of the static file
                     asset_filename = file_basename.replace(self.build_static_dir, '').lstrip("/")
 
-                    with open(file_fullpath, "w") as f:
-                        content = sfc_c.get(o)
-                        content = content.replace('[[__STATIC_URL__]]', self.static_url.rstrip("/"))
-
-                        '''
-                        For stylesheet, if the tag contains 'scss' attribute, 
-                        convert scss to css
-                        '''
-                        if o == 'style' and "scss" in sfc_c["style_props"].strip():
-                            content = utils.convert_scss_to_css(content)
-                        f.write(content)
+                    utils.write_file(file_fullpath, content)
+                    self._sfc_assets.append((asset_filename, file_fullpath, content, deps))
 
                     assets_key = "scripts" if o == "script" else "stylesheets"
                     assets[assets_key].append({
@@ -700,20 +1961,240 @@ class Mambo(object):
                         })
         return assets
 
-    def build(self, print_info=False):
+    def _minify_asset(self, ext, content):
+        '''
+        Minify the content of a CSS or JS asset
+        :param ext: css|js
+        :param content: string
+        '''
+        minifier = minify.get_minifier("asset.%s" % ext)
+        if minifier:
+            with self.profiler.phase("minify_assets"):
+                content = minifier(content)
+        return content
+
+    def _bundle_page_assets(self, assets):
+        '''
+        Concatenate the local scripts and stylesheets of a page, each kind in one file.
+        Only consecutive assets are bundled together (and scripts with the same attributes), 
+        so the order is kept. Remote assets, module scripts, scripts with src, async
+        or defer, and stylesheets with @import or @charset are left as is.
+        The relative url() of the stylesheets are rewritten for the bundle location.
+        The bundles are named by the hash of their content, pages with the same assets share them
+        :param assets: dict of scripts and stylesheets
+        :returns dict:
+        '''
+        return {
+            "scripts": self._bundle_assets_list(assets["scripts"], "js"),
+            "stylesheets": self._bundle_assets_list(assets["stylesheets"], "css")
+        }
+
+    def _bundle_assets_list(self, items, ext):
+        bundled = []
+        run = []
+        for item in items:
+            if ext == "js" and RE_UNBUNDLED_SCRIPT.search(item.get("attributes") or ""):
+                content = None
+            else:
+                content = self._asset_content(item["url"], ext)
+            if ext == "css" and content is not None:
+                # @import and @charset are only valid at the start of a stylesheet
+                if utils.RE_CSS_HEAD_RULES.search(content):
+                    content = None
+                else:
+                    src_dir = item["url"].lstrip("/").rpartition("/")[0]
+                    content = utils.rebase_css_urls(content, src_dir, ASSETS_BUNDLES_DIR)
+            if run and (content is None or (ext == "js" and item.get("attributes") != run[0][0].get("attributes"))):
+                bundled.extend(self._write_assets_bundle(run, ext))
+                run = []
+            if content is None:
+                bundled.append(item)
+            else:
+                run.append((item, content))
+        if run:
+            bundled.extend(self._write_assets_bundle(run, ext))
+        return bundled
+
+    def _asset_content(self, url, ext):
+        '''
+        Return the content of a local asset, from the SFC of the page or the static dir
+        :returns string: None if the asset is remote or not found
+        '''
+        if not url or utils.is_https_string(url) or url.startswith("//") or not url.endswith("." + ext):
+            return None
+        url = url.lstrip("/")
+        if url in self._sfc_assets_contents:
+            return self._sfc_assets_contents[url]
+        filepath = os.path.join(self.static_dir, url)
+        if not os.path.isfile(filepath):
+            return None
+        self._add_dependency("static:%s" % url)
+        with open(filepath) as f:
+            content = f.read()
+        return self._minify_asset(ext, content) if self.minify_assets else content
+
+    def _write_assets_bundle(self, run, ext):
+        '''
+        Write the bundle of assets
+        :param run: list of tuple (asset item, content)
+        :param ext: css|js
+        :returns list: the assets items, the bundle or the item alone
+        '''
+        if len(run) == 1:
+            return [run[0][0]]
+        # ';' ends the last statement of a script without one
+        content = (";\n" if ext == "js" else "\n").join(c for _, c in run)
+        url = "%s/%s.%s" % (ASSETS_BUNDLES_DIR, hash_string(content)[:16], ext)
+        file_fullpath = os.path.join(self.build_static_dir, url)
+        # static_url() adds the checksum to the url with the 'build' cache busting mode
+        if self.enable_cache_busting and self.cache_busting_mode == "build" and self.cache_busting_checksum:
+            file_fullpath = utils.insert_checksum_in_filepath(file_fullpath, self.cache_busting_checksum)
+        os.makedirs(os.path.dirname(file_fullpath), exist_ok=True)
+        self._add_output(file_fullpath)
+        utils.write_file(file_fullpath, content)
+        return [{"url": url, "attributes": run[0][0].get("attributes")}]
+
+    def _add_dependency(self, dep):
+        ''' Add a dependency to the page being built '''
+        if self._current_deps is not None:
+            self._current_deps.add(dep)
+
+    def _add_output(self, filepath):
+        ''' Add a file created by the page being built '''
+        if self._current_outputs is not None:
+            self._current_outputs.append(self._build_relpath(filepath))
+
+    def build(self, print_info=False, incremental=None, jobs=None, async_build=None):
+        '''
+        Build the site
+        :param print_info: bool, to print the build info
+        :param incremental: bool, to only rebuild the pages whose files changed since the
+                            last build. Default to the config 'build.incremental'
+        :param jobs: int, the number of processes to build the pages with.
+                     Default to the config 'build.workers'
+        :param async_build: bool, to build with the async pipeline. Default to the config 'build.async_build'
+        '''
         self._verbose = print_info
-        self.clean_build_dir()
+        self._sfc_cache.clear()
+        if jobs is not None:
+            self.workers = jobs
+        if async_build is not None:
+            self.async_build = async_build
+        if incremental is None:
+            incremental = self.incremental
+        # The bundles of the pages are in the static dir, copied again in full when the stamp changed
+        self._incremental = incremental and not self._static_stamp_changed() and self.build_cache.load()
+        if not self._incremental:
+            self.build_cache.clear()
         if not os.path.isdir(self.build_dir):
             os.makedirs(self.build_dir)
-        self.generate_cache_busting_checksum()
-        self.build_static()
-        self.build_pages()
-        
-        if self.build_config.get("generate_sitemap") is True:
-            generate_sitemap(self.build_dir, self.manifest)
+        with self.profiler.phase("build"):
+            self.generate_cache_busting_checksum()
+            if self.async_build:
+                # The page workers are forked from the main thread, once the threads of the pipeline are done
+                parallel = self._pages_workers() > 1
+                asyncio.run(self._build_async(build_pages=not parallel))
+                if parallel:
+                    self._build_aggregated_pages()
+            else:
+                with self.profiler.phase("static"):
+                    self.build_static()
+                self.build_pages()
+
+            if self.build_config.get("generate_sitemap") is True:
+                with self.profiler.phase("sitemap"):
+                    self.write_sitemap()
+
+            # Files are only rewritten when they change, the ones left from the previous build are deleted
+            if not self._incremental:
+                with self.profiler.phase("prune"):
+                    self.prune_build_dir()
+
+            if self.precompress:
+                with self.profiler.phase("precompress"):
+                    self.precompress_build_dir()
+
+            if incremental:
+                self.build_cache.save()
+        self._wait_html_writes(close=True)
+
+    async def _build_async(self, build_pages=True):
+        '''
+        Build the static files and the pages with the async pipeline.
+        The static files are copied while the pages are aggregated, as the pages only need
+        the static files to render. The rendered pages are put in a bounded queue,
+        written by I/O workers while the next pages render.
+        :param build_pages: bool, False to only copy the static files and aggregate the pages,
+                            ie: to build the pages with workers, which write their own pages
+        '''
+        def build_static():
+            with self.profiler.phase("static"):
+                self.build_static()
+
+        def aggregate():
+            with self.profiler.phase("aggregate"):
+                self.aggregate_pages_data()
+
+        await asyncio.gather(pipeline.run_in_thread(build_static), pipeline.run_in_thread(aggregate))
+        if not build_pages:
+            return
+
+        self._write_queue = pipeline.WriteQueue(self.write_workers, self.write_queue_size)
+        await self._write_queue.start()
+        try:
+            await pipeline.run_in_thread(self._build_aggregated_pages)
+        finally:
+            write_queue, self._write_queue = self._write_queue, None
+            with self.profiler.phase("write"):
+                await write_queue.close()
 
     def generate_cache_busting_checksum(self):
-        if self.enable_cache_busting is True:
-            self.cache_busting_checksum = utils.gen_random_str()
+        if self.enable_cache_busting is True and self.cache_busting_mode == "build":
+            # Keep the same checksum on incremental builds, so unchanged pages keep their urls
+            if self._incremental and self.build_cache.values.get("cache_busting_checksum"):
+                self.cache_busting_checksum = self.build_cache.values["cache_busting_checksum"]
+            else:
+                self.cache_busting_checksum = utils.gen_random_str()
+            self.build_cache.values["cache_busting_checksum"] = self.cache_busting_checksum
+
+
+# ==============================================================================
+# Build workers
 
+# The Mambo instance of a worker process
+_worker = None
 
+def _init_build_worker(root_dir, options, verbose, cache_busting_checksum, assets_manifest, timestamp, pages, pages_short_mapper):
+    '''
+    Initialize a worker process with its own Mambo instance and template environment
+    '''
+    global _worker
+    _worker = Mambo(root_dir, options)
+    _worker._verbose = verbose
+    _worker.cache_busting_checksum = cache_busting_checksum
+    _worker.assets_manifest = assets_manifest
+    _worker.site_config["__generator__"]["timestamp"] = timestamp
+    _worker.pages = pages
+    _worker.pages_short_mapper = pages_short_mapper
+    _worker._index_pages()
+    _worker._update_app_data()
+
+def _build_pages_worker(filenames):
+    '''
+    Build a chunk of pages in a worker process
+    :param filenames: list of pages
+    :returns tuple: (list of tuple (filename, build record), the profiler timings of the chunk)
+    '''
+    # Each chunk returns its own timings, to be merged in the main process
+    _worker.profiler = Profiler(enabled=_worker.profiler.enabled)
+    for filename in filenames:
+        _worker._build_page(filename)
+    _worker._wait_html_writes()
+    records = [(filename, _worker.build_cache.pages[filename]) for filename in filenames]
+    return records, _worker.profiler.dump() if _worker.profiler.enabled else None
+
+def _write_html(dest_file, content, engine):
+    '''
+    Minify and write a page. Runs in the html writers of Mambo._write_html_async()
+    '''
+    utils.write_file(dest_file, minify.get_html_minifier(engine)(content))
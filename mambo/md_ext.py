@@ -2,15 +2,37 @@
 A utils for Markdown
 
 convert : render markdown to html
+get_engine : Return the Markdown instance of the current thread
+mkd : The Markdown instance of convert(), of the current thread
+setup_cache : Set the size and the directory of the conversion cache
 get_toc : Get the Table of Content
 get_images: Return a list of images, can be used to extract the top image
 
 """
 
 import os
+import threading
 import markdown
 from jinja2.nodes import CallBlock
 from jinja2.ext import Extension
+from .cache import TextCache, hash_string
+
+# Max number of converted texts to keep in memory
+CACHE_SIZE = 1000
+
+# The version of Markdown, part of the cache key
+MARKDOWN_VERSION = markdown.__version__ if isinstance(markdown.__version__, str) else markdown.version
+
+# Extensions of convert()
+EXTENSIONS = [
+    'markdown.extensions.extra',
+    'markdown.extensions.nl2br',
+    'markdown.extensions.sane_lists',
+    'markdown.extensions.toc'
+]
+
+# Extensions of the {% markdown %} tag
+TAG_EXTENSIONS = ['extra']
 
 # ------------------------------------------------------------------------------
 
@@ -28,7 +50,7 @@ class MarkdownTagExtension(Extension):
     def __init__(self, environment):
         super(MarkdownTagExtension, self).__init__(environment)
         environment.extend(
-            markdowner=markdown.Markdown(extensions=['extra'])
+            markdowner=EngineProxy(TAG_EXTENSIONS)
         )
 
     def parse(self, parser):
@@ -67,8 +89,7 @@ class MarkdownTagExtension(Extension):
         return output.strip()
 
     def _render_markdown(self, block):
-        block = self.environment.markdowner.convert(block)
-        return block
+        return _cached_convert(TAG_EXTENSIONS, block)
 
 class MarkdownExtension(Extension):
 
@@ -82,12 +103,91 @@ class MarkdownExtension(Extension):
         return convert(source)
 
 # Markdown
-mkd = markdown.Markdown(extensions=[
-    'markdown.extensions.extra',
-    'markdown.extensions.nl2br',
-    'markdown.extensions.sane_lists',
-    'markdown.extensions.toc'
-])
+# A Markdown instance keeps the state of the conversion, so it can't be shared
+# between threads. Each thread has its own instances, by extensions
+_engines = threading.local()
+
+def get_engine(extensions=EXTENSIONS):
+    '''
+    Return the Markdown instance of the current thread for the extensions
+    :param extensions: list
+    :returns markdown.Markdown:
+    '''
+    engines = getattr(_engines, "engines", None)
+    if engines is None:
+        engines = _engines.engines = {}
+    key = tuple(extensions)
+    md = engines.get(key)
+    if md is None:
+        md = engines[key] = markdown.Markdown(extensions=list(extensions))
+    return md
+
+class EngineProxy(object):
+    '''
+    A Markdown instance for any thread: the attributes are the ones of
+    get_engine(extensions) in the calling thread, ie: mkd.convert(text)
+    '''
+
+    def __init__(self, extensions=EXTENSIONS):
+        '''
+        :param extensions: list
+        '''
+        self.extensions = extensions
+
+    def __getattr__(self, name):
+        return getattr(get_engine(self.extensions), name)
+
+mkd = EngineProxy(EXTENSIONS)
+
+
+class ConvertCache(TextCache):
+    '''
+    Cache of the converted texts, by hash of the text and the extensions.
+    Kept in memory in a LRU, and on disk when a directory is set, so
+    unchanged texts are not converted again on the next builds
+    '''
+
+    extension = ".html"
+
+    def __init__(self, size=CACHE_SIZE, directory=None):
+        '''
+        :param size: the max number of texts in memory
+        :param directory: the dir of the disk cache. None to disable it
+        '''
+        super(ConvertCache, self).__init__(size, directory)
+
+    def key(self, extensions, text):
+        '''
+        The key of a text. The version of Markdown is included, as the html may
+        change with it
+        '''
+        return hash_string("\0".join([MARKDOWN_VERSION, ",".join(extensions), text]))
+
+cache = ConvertCache()
+
+def setup_cache(size=CACHE_SIZE, directory=None):
+    '''
+    Set the conversion cache
+    :param size: the max number of texts in memory
+    :param directory: the dir of the disk cache. None to keep the cache in memory only
+    '''
+    global cache
+    cache = ConvertCache(size, directory)
+
+def _cached_convert(extensions, text):
+    '''
+    Convert MD text to HTML, once per text. Safe to call from many threads
+    :param extensions: list of the Markdown extensions
+    :param text:
+    '''
+    key = cache.key(extensions, text)
+    html = cache.get(key)
+    if html is None:
+        md = get_engine(extensions)
+        md.reset()
+        html = md.convert(text)
+        cache.set(key, html)
+    return html
 
 def convert(text):
     '''
@@ -95,6 +195,5 @@ def convert(text):
     :param text:
     :return:
     '''
-    mkd.reset()
-    return mkd.convert(text)
+    return _cached_convert(EXTENSIONS, text)
 
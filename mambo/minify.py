@@ -0,0 +1,249 @@
+"""
+HTML, CSS and JS minification
+
+minify_css: Minify CSS. Uses rcssmin when installed
+minify_js: Minify JS. Uses rjsmin when installed, otherwise the JS is returned as is
+minify_html: Minify HTML with htmlmin
+HtmlMinifier: A faster HTML minifier, collapsing the whitespace. Each line is minified once
+get_minifier: Return the minifier of a file by its extension
+get_html_minifier: Return the HTML minifier of an engine
+
+To install the optional minifiers: pip install rcssmin rjsmin
+"""
+
+import re
+import threading
+import htmlmin
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+# Strings are kept as is, comments are removed. Comments starting with /*! are kept (licenses)
+RE_CSS_TOKENS = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|/\*![\s\S]*?\*/)|/\*[\s\S]*?\*/')
+RE_CSS_PLACEHOLDERS = re.compile(r'\x00(\d+)\x00')
+RE_CSS_SPACES = re.compile(r'\s+')
+RE_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+# The engines of minify_html: True is htmlmin
+HTML_MINIFY_ENGINES = ("htmlmin", "fast")
+
+# Max number of minified lines to keep in memory
+HTML_CACHE_SIZE = 20000
+
+# The HTML whitespace. Other spaces, ie: &nbsp; as a character, are content
+HTML_SPACES = " \t\n\r\f\v"
+
+# The elements kept as is, and the comments
+RE_HTML_RAW = re.compile(r'(<pre\b[\s\S]*?</pre\s*>|<textarea\b[\s\S]*?</textarea\s*>|'
+                         r'<script\b[\s\S]*?</script\s*>|<style\b[\s\S]*?</style\s*>|<!--[\s\S]*?-->)', re.IGNORECASE)
+# A tag starts with a letter, '/', '!' or '?' after the '<', a '>' in a quoted attribute value doesn't end it.
+# Another '<' is text
+RE_HTML_TAG = re.compile(r'(<[A-Za-z/!?](?:"[^"]*"|\'[^\']*\'|[^\'">])*>)')
+# The html up to a tag left open, and the attributes of a tag up to its end or an attribute value left open
+RE_HTML_CLOSED = re.compile(r'(?:[^<]|<(?![A-Za-z/!?])|<[A-Za-z/!?](?:"[^"]*"|\'[^\']*\'|[^\'">])*>)*')
+RE_HTML_TAG_BODY = re.compile(r'(?:"[^"]*"|\'[^\']*\'|[^\'">])*')
+RE_HTML_SPACES = re.compile(r'[ \t\n\r\f\v]+')
+RE_HTML_COLLAPSIBLE = re.compile(r'[ \t\n\r\f\v]{2,}|[\t\n\r\f\v]')
+
+
+def minify_css(css):
+    '''
+    Minify CSS
+    :param css: string
+    :returns string:
+    '''
+    if rcssmin is not None:
+        return rcssmin.cssmin(css, keep_bang_comments=True)
+
+    kept = []
+    def _keep(m):
+        if m.group(1) is None:
+            return " "
+        kept.append(m.group(1))
+        return "\x00%d\x00" % (len(kept) - 1)
+
+    css = RE_CSS_TOKENS.sub(_keep, css)
+    css = RE_CSS_SPACES.sub(" ", css)
+    css = RE_CSS_PUNCTUATION.sub(r"\1", css)
+    css = css.replace(";}", "}").strip()
+    return RE_CSS_PLACEHOLDERS.sub(lambda m: kept[int(m.group(1))], css)
+
+def minify_js(js):
+    '''
+    Minify JS. Without rjsmin the JS is returned as is, as it can't be minified safely
+    with regular expressions
+    :param js: string
+    :returns string:
+    '''
+    if rjsmin is not None:
+        return rjsmin.jsmin(js, keep_bang_comments=True)
+    return js
+
+def minify_html(html):
+    '''
+    Minify HTML with htmlmin
+    :param html: string
+    :returns string:
+    '''
+    return htmlmin.minify(html, keep_pre=True)
+
+class HtmlMinifier(object):
+    '''
+    A faster HTML minifier than htmlmin. The whitespace between and around the tags is
+    collapsed to one space, the tags are kept as is, and so are the pre, textarea, script
+    and style elements and the comments.
+    Most lines of a page come from its layout, each line is minified once and kept in a cache
+    '''
+
+    def __init__(self, cache_size=HTML_CACHE_SIZE):
+        '''
+        :param cache_size: the max number of minified lines in memory
+        '''
+        self.cache_size = cache_size
+        self._lines = {}
+        # The cache is shared by the threads writing the pages. Reading a dict is atomic,
+        # adding to the cache and clearing it are done under the lock
+        self._lock = threading.Lock()
+
+    def minify(self, html):
+        '''
+        Minify HTML
+        :param html: string
+        :returns string:
+        '''
+        parts = RE_HTML_RAW.split(html)
+        parts[::2] = [self._minify_text(text) for text in parts[::2]]
+        return "".join(parts)
+
+    def _minify_text(self, text):
+        '''
+        Minify the html between the raw elements, line by line.
+        A tag on many lines is minified with its lines, as one
+        '''
+        lines = []
+        pending = []
+        state = None
+        for line in text.split("\n"):
+            if state:
+                pending.append(line)
+                state = _open_state(line, state)
+                if not state:
+                    lines.append(self._minify_line("\n".join(pending).strip(HTML_SPACES)))
+                    pending = []
+                continue
+            line = line.strip(HTML_SPACES)
+            if not line:
+                continue
+            # The cache has the lines minified, and what the lines leaving a tag open leave open, in a tuple
+            minified = self._lines.get(line)
+            if minified is None:
+                state = _open_state(line)
+                minified = self._cache_line(line, (state,)) if state else self._minify_line(line)
+            if isinstance(minified, tuple):
+                state = minified[0]
+                pending.append(line)
+                continue
+            lines.append(minified)
+        # A tag left open at the end, the cache keeps its first line as open
+        if pending:
+            lines.append(_collapse_spaces("\n".join(pending).strip(HTML_SPACES)))
+
+        if not lines:
+            return " " if text else ""
+        minified = " ".join(lines)
+        if text[0] in HTML_SPACES:
+            minified = " " + minified
+        if text[-1] in HTML_SPACES:
+            minified += " "
+        return minified
+
+    def _minify_line(self, line):
+        ''' Minify a line without its leading and trailing whitespace, once '''
+        minified = self._lines.get(line)
+        if isinstance(minified, str):
+            return minified
+        return self._cache_line(line, _collapse_spaces(line))
+
+    def _cache_line(self, line, value):
+        ''' Keep a line in the cache, and return the value '''
+        with self._lock:
+            if len(self._lines) >= self.cache_size:
+                self._lines.clear()
+            self._lines[line] = value
+        return value
+
+def _collapse_spaces(html):
+    ''' Collapse the whitespace between and around the tags of some html to one space '''
+    if not RE_HTML_COLLAPSIBLE.search(html):
+        return html
+    tokens = RE_HTML_TAG.split(html)
+    tokens[::2] = [RE_HTML_SPACES.sub(" ", token) for token in tokens[::2]]
+    return "".join(tokens)
+
+def _open_state(line, state=None):
+    '''
+    Return what a line of html leaves open
+    :param line: string
+    :param state: what the previous lines left open
+    :returns string: None when nothing is left open, '<' in a tag, or the quote of an attribute value
+    '''
+    i = 0
+    while True:
+        if state == "<":
+            i = RE_HTML_TAG_BODY.match(line, i).end()
+            if i == len(line):
+                return state
+            state = line[i]
+            i += 1
+            if state != ">":
+                continue
+        elif state:
+            i = line.find(state, i)
+            if i == -1:
+                return state
+            state = "<"
+            i += 1
+            continue
+        i = RE_HTML_CLOSED.match(line, i).end()
+        if i == len(line):
+            return None
+        # The '<' and the first character of the tag
+        state = "<"
+        i += 2
+
+# The fast minifier of the process, its cache is kept between the pages
+html_minifier = HtmlMinifier()
+
+def get_html_minifier(engine):
+    '''
+    Return the HTML minifier of an engine
+    :param engine: 'htmlmin', or 'fast' for the HtmlMinifier
+    :returns function:
+    '''
+    if engine == "fast":
+        return html_minifier.minify
+    if engine == "htmlmin":
+        return minify_html
+    raise ValueError("Minify Error: the html engine must be one of %s" % ", ".join(HTML_MINIFY_ENGINES))
+
+def get_minifier(filepath):
+    '''
+    Return the minifier of a file by its extension
+    :param filepath:
+    :returns function: None if the file is not CSS or JS, or is already minified (.min.css, .min.js),
+                       or is JS and rjsmin is not installed
+    '''
+    if filepath.endswith((".min.css", ".min.js")):
+        return None
+    if filepath.endswith(".css"):
+        return minify_css
+    if filepath.endswith(".js") and rjsmin is not None:
+        return minify_js
+    return None
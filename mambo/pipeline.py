@@ -0,0 +1,95 @@
+"""
+Async build pipeline
+
+WriteQueue : A bounded queue of the files to write, drained by I/O workers
+run_in_thread : Run a function in a thread of the event loop, and return its result
+
+The pages render in a thread while the event loop runs the I/O workers, so
+rendering only waits on the filesystem when the queue is full.
+"""
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from . import utils
+
+# Number of I/O workers
+WRITE_WORKERS = 4
+
+# Max number of files waiting to be written
+WRITE_QUEUE_SIZE = 64
+
+# ------------------------------------------------------------------------------
+
+class WriteQueue(object):
+    '''
+    A bounded queue of the files to write, drained by I/O workers.
+    Files are put from any thread but the event loop's. A file always goes to the same worker,
+    so the writes of a file keep their order
+    '''
+
+    def __init__(self, workers=WRITE_WORKERS, size=WRITE_QUEUE_SIZE, write=utils.write_file):
+        '''
+        :param workers: int, the number of I/O workers
+        :param size: int, the max number of files waiting
+        :param write: function(filepath, content), to write a file
+        '''
+        self.workers = max(1, workers)
+        self.size = max(self.workers, size)
+        self.write = write
+        self._loop = None
+        self._queues = []
+        self._tasks = []
+        self._executor = None
+        self._errors = []
+
+    async def start(self):
+        ''' Start the I/O workers, in the running event loop '''
+        self._loop = asyncio.get_running_loop()
+        self._executor = ThreadPoolExecutor(self.workers)
+        self._queues = [asyncio.Queue(self.size // self.workers) for _ in range(self.workers)]
+        self._tasks = [self._loop.create_task(self._worker(queue)) for queue in self._queues]
+
+    async def _worker(self, queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            try:
+                await self._loop.run_in_executor(self._executor, self.write, *item)
+            except Exception as e:
+                self._errors.append(e)
+
+    def put(self, filepath, content):
+        '''
+        Add a file to write, waiting while the queue is full.
+        Raises the error of a previous write
+        :param filepath: string
+        :param content: string or bytes
+        '''
+        if self._errors:
+            raise self._errors[0]
+        queue = self._queues[hash(filepath) % self.workers]
+        asyncio.run_coroutine_threadsafe(queue.put((filepath, content)), self._loop).result()
+
+    async def close(self):
+        '''
+        Wait for the files to be written, and stop the I/O workers.
+        Raises the first error of the writes
+        '''
+        for queue in self._queues:
+            await queue.put(None)
+        await asyncio.gather(*self._tasks)
+        self._executor.shutdown()
+        if self._errors:
+            raise self._errors[0]
+
+
+async def run_in_thread(fn, *args, **kwargs):
+    '''
+    Run a function in a thread of the event loop, and return its result
+    :param fn: function
+    :returns: the result of fn
+    '''
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(fn, *args, **kwargs))
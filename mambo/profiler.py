@@ -0,0 +1,145 @@
+"""
+Build profiler
+
+Records the wall and CPU time of each build phase, along with the time of each
+page and template, to find where a build spends its time.
+
+Phases can be nested, ie: 'page' includes 'render', 'minify' and 'write' of that page.
+Phases can run in several threads, ie: with the async build. The CPU time is of the whole
+process, so it is only recorded for the phases that ran while no other thread was in a phase,
+the others only have their wall time.
+"""
+
+import os
+import time
+import json
+import threading
+from contextlib import contextmanager
+
+
+class Profiler(object):
+
+    def __init__(self, enabled=True):
+        '''
+        :param enabled: bool, when False nothing is recorded
+        '''
+        self.enabled = enabled
+        self.phases = {}
+        self.pages = {}
+        self.templates = {}
+        self._lock = threading.Lock()
+        # The phases open in each thread, and the threads with open phases
+        self._local = threading.local()
+        self._threads = set()
+        # Incremented each time phases are open in more than one thread
+        self._overlaps = 0
+
+    @contextmanager
+    def phase(self, name, page=None, template=None):
+        '''
+        Time a block of code
+        :param name: the phase name
+        :param page: the page the time is added to
+        :param template: the template the time is added to
+        '''
+        if not self.enabled:
+            yield
+            return
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        with self._lock:
+            if not stack:
+                self._threads.add(threading.get_ident())
+                if len(self._threads) > 1:
+                    self._overlaps += 1
+            stack.append(name)
+            overlaps = self._overlaps
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            with self._lock:
+                stack.pop()
+                if overlaps != self._overlaps or len(self._threads) > 1:
+                    cpu = None
+                if not stack:
+                    self._threads.discard(threading.get_ident())
+                self._add(self.phases, name, wall, cpu)
+                if page:
+                    self._add(self.pages, page, wall, cpu)
+                if template:
+                    self._add(self.templates, template, wall, cpu)
+
+    def _add(self, timings, key, wall, cpu, count=1):
+        '''
+        Add a timing. A cpu of None, when it is unknown, makes the total unknown
+        '''
+        t = timings.setdefault(key, [0.0, 0.0, 0])
+        t[0] += wall
+        t[1] = None if cpu is None or t[1] is None else t[1] + cpu
+        t[2] += count
+
+    def dump(self):
+        ''' Return the raw timings, to be merged into another profiler '''
+        return {"phases": self.phases, "pages": self.pages, "templates": self.templates}
+
+    def merge(self, data):
+        '''
+        Merge the timings from another profiler, ie: from a build worker
+        :param data: dict from Profiler.dump()
+        '''
+        with self._lock:
+            for name in ("phases", "pages", "templates"):
+                timings = getattr(self, name)
+                for key, t in data[name].items():
+                    self._add(timings, key, *t)
+
+    def report(self, top=10):
+        '''
+        Return the report of the timings
+        :param top: the number of the slowest pages and templates
+        :returns dict:
+        '''
+        def rows(timings, key):
+            items = sorted(timings.items(), key=lambda kv: (-kv[1][0], kv[0]))
+            return [{key: k, "wall": round(t[0], 6), "cpu": None if t[1] is None else round(t[1], 6), "count": t[2]} for k, t in items]
+
+        return {
+            "phases": {r["phase"]: {k: r[k] for k in ("wall", "cpu", "count")} for r in rows(self.phases, "phase")},
+            "pages": rows(self.pages, "page")[:top],
+            "templates": rows(self.templates, "template")[:top]
+        }
+
+    def save(self, filepath, top=10):
+        '''
+        Write the report as JSON
+        :param filepath:
+        :param top: the number of the slowest pages and templates
+        '''
+        dest_dir = os.path.dirname(filepath)
+        if dest_dir and not os.path.isdir(dest_dir):
+            os.makedirs(dest_dir)
+        with open(filepath, "w") as f:
+            json.dump(self.report(top), f, indent=2, sort_keys=True)
+
+    def format_report(self, top=10):
+        '''
+        Return the report as lines of text
+        :param top: the number of the slowest pages and templates
+        :returns list:
+        '''
+        report = self.report(top)
+        lines = ["%-20s %10s %10s %8s" % ("Phase", "Wall (s)", "CPU (s)", "Count")]
+        for name, t in sorted(report["phases"].items(), key=lambda kv: -kv[1]["wall"]):
+            cpu = "-" if t["cpu"] is None else "%.3f" % t["cpu"]
+            lines.append("%-20s %10.3f %10s %8d" % (name, t["wall"], cpu, t["count"]))
+        for title, key in (("Slowest pages", "page"), ("Slowest templates", "template")):
+            lines.append("")
+            lines.append("%s:" % title)
+            for r in report["%ss" % key]:
+                lines.append("%10.3f  %s" % (r["wall"], r[key]))
+        return lines
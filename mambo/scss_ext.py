@@ -0,0 +1,191 @@
+"""
+A utils for SCSS
+
+compile_string : Compile SCSS to CSS, once per source and content of its imports
+compile_strings : Compile many SCSS sources, the ones not cached in a pool of processes
+find_imports : Return the files imported by a SCSS source, and by its imports
+get_compiler : Return the SCSS compiler of the current thread
+setup_cache : Set the size and the directory of the compilation cache
+
+"""
+
+import os
+import re
+import threading
+import multiprocessing
+import scss
+from scss import Compiler
+from .cache import TextCache, hash_string
+
+# Max number of compiled sources to keep in memory
+CACHE_SIZE = 500
+
+# Min number of sources to compile in a pool of processes. Below, starting
+# the pool costs more than compiling them one after the other
+POOL_MIN_SOURCES = 8
+
+# The version of pyScss, part of the cache key
+SCSS_VERSION = getattr(scss, "__version__", "")
+
+RE_IMPORT = re.compile(r'@import\s+([^;]+);')
+RE_IMPORT_NAME = re.compile(r'''["']([^"']+)["']''')
+
+# ------------------------------------------------------------------------------
+
+class CompileCache(TextCache):
+    '''
+    Cache of the compiled CSS, by hash of the source, the search path and
+    the content of the imported files. Changing an imported file changes the key
+    '''
+
+    extension = ".css"
+
+    def __init__(self, size=CACHE_SIZE, directory=None):
+        '''
+        :param size: the max number of sources in memory
+        :param directory: the dir of the disk cache. None to disable it
+        '''
+        super(CompileCache, self).__init__(size, directory)
+
+    def key(self, source, search_path, imports):
+        '''
+        The key of a source
+        :param source: string
+        :param search_path: tuple of dirs
+        :param imports: list of the imported files, from find_imports()
+        '''
+        return hash_string("\0".join(
+            [SCSS_VERSION, "\n".join(search_path), source] +
+            ["%s=%s" % (filepath, _file_hash(filepath)) for filepath in imports]
+        ))
+
+cache = CompileCache()
+
+def setup_cache(size=CACHE_SIZE, directory=None):
+    '''
+    Set the compilation cache
+    :param size: the max number of sources in memory
+    :param directory: the dir of the disk cache. None to keep the cache in memory only
+    '''
+    global cache
+    cache = CompileCache(size, directory)
+
+# Hash of the imported files, by path: (size, mtime, hash)
+_file_hashes = {}
+
+def _file_hash(filepath):
+    ''' Return the hash of a file, reused as long as its size and mtime don't change '''
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    cached = _file_hashes.get(filepath)
+    if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+        return cached[2]
+    with open(filepath, encoding="utf-8") as f:
+        h = hash_string(f.read())
+    _file_hashes[filepath] = (st.st_size, st.st_mtime_ns, h)
+    return h
+
+def _resolve_import(name, search_path):
+    '''
+    Return the file of an import, ie: 'base/colors' can be base/colors.scss or base/_colors.scss
+    :returns string: None for a CSS import, or a file not found
+    '''
+    if name.endswith(".css") or name.startswith(("http://", "https://", "//")):
+        return None
+    for dir in search_path:
+        head, tail = os.path.split(os.path.join(dir, name))
+        for f in (tail, tail + ".scss", "_" + tail, "_" + tail + ".scss"):
+            filepath = os.path.join(head, f)
+            if os.path.isfile(filepath):
+                return os.path.abspath(filepath)
+    return None
+
+def find_imports(source, search_path=()):
+    '''
+    Return the files imported by a SCSS source, and by its imports
+    :param source: string
+    :param search_path: list of dirs to find the imports in
+    :returns list: the full paths of the files, in the order they are found
+    '''
+    imports = []
+    stack = [(source, list(search_path))]
+    while stack:
+        source, dirs = stack.pop()
+        for statement in RE_IMPORT.findall(source):
+            for name in RE_IMPORT_NAME.findall(statement):
+                filepath = _resolve_import(name, dirs)
+                if filepath and filepath not in imports:
+                    imports.append(filepath)
+                    with open(filepath, encoding="utf-8") as f:
+                        stack.append((f.read(), [os.path.dirname(filepath)] + dirs))
+    return imports
+
+# SCSS compilers, by search path, one set per thread
+_compilers = threading.local()
+
+def get_compiler(search_path=()):
+    '''
+    Return the SCSS compiler of the current thread for the search path
+    :param search_path: tuple of dirs
+    :returns scss.Compiler:
+    '''
+    compilers = getattr(_compilers, "compilers", None)
+    if compilers is None:
+        compilers = _compilers.compilers = {}
+    compiler = compilers.get(search_path)
+    if compiler is None:
+        compiler = compilers[search_path] = Compiler(search_path=list(search_path))
+    return compiler
+
+def _compile(args):
+    ''' Compile a source. Runs in the pool of processes of compile_strings() '''
+    source, search_path = args
+    return get_compiler(search_path).compile_string(source)
+
+def compile_string(source, search_path=()):
+    '''
+    Compile SCSS to CSS, once per source and content of its imports. Safe to call from many threads
+    :param source: string
+    :param search_path: list of dirs to find the imports in
+    :returns tuple: (string css, list of the imported files)
+    '''
+    search_path = tuple(search_path)
+    imports = find_imports(source, search_path)
+    key = cache.key(source, search_path, imports)
+    css = cache.get(key)
+    if css is None:
+        css = _compile((source, search_path))
+        cache.set(key, css)
+    return css, imports
+
+def compile_strings(sources, workers=1):
+    '''
+    Compile many SCSS sources. The ones not in the cache are compiled in a pool of processes,
+    when there are at least POOL_MIN_SOURCES of them and it's called from the main thread,
+    as forking from another thread can deadlock on the locks held by the other threads
+    :param sources: list of tuple (source, search_path)
+    :param workers: int, the number of processes
+    :returns list: tuple (css, imports) of each source, in the order of the sources
+    '''
+    results = []
+    missing = []
+    for source, search_path in sources:
+        search_path = tuple(search_path)
+        imports = find_imports(source, search_path)
+        key = cache.key(source, search_path, imports)
+        css = cache.get(key)
+        if css is None:
+            missing.append((len(results), key, (source, search_path)))
+        results.append((css, imports))
+
+    if workers > 1 and len(missing) >= POOL_MIN_SOURCES and threading.current_thread() is threading.main_thread():
+        with multiprocessing.Pool(min(workers, len(missing))) as pool:
+            compiled = pool.map(_compile, [args for _, _, args in missing])
+    else:
+        compiled = [_compile(args) for _, _, args in missing]
+    for (i, key, _), css in zip(missing, compiled):
+        cache.set(key, css)
+        results[i] = (css, results[i][1])
+    return results
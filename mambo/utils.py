@@ -1,13 +1,25 @@
 
 import os
 import re
+import bisect
+import posixpath
 import uuid
 import yaml
 import mimetypes
-from scss import Compiler as SCSS
+import gzip
+import shutil
+import filecmp
+import functools
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from distutils.errors import DistutilsFileError, DistutilsInternalError
-from distutils.file_util import copy_file
-from distutils.dir_util import mkpath
+from . import scss_ext
+from .cache import hash_bytes
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
 '''
 For Single File Component
@@ -18,9 +30,24 @@ RE_SFC_SCRIPT = re.compile(
     r'<script\s*(.*)\s*>\n?([\S\s]*?)<\/script\s*>', re.IGNORECASE)
 RE_SFC_STYLE = re.compile(
     r'<style\s*(.*)\s*>\n?([\S\s]*?)<\/style\s*>', re.IGNORECASE)
+# The extends tag and the __PAGE_CONTENT__ block of a page
+RE_EXTENDS = re.compile(r'{%\s*extends\s+(.*?)\s*%}')
+RE_BLOCK_BODY = re.compile(r'{%\s*block\s+__PAGE_CONTENT__\s*%}')
+# The extends tag and the __PAGE_CONTENT__ block, found in one scan
+RE_PAGE_TAGS = re.compile(r'{%\s*(?:(extends)\s+|block\s+__PAGE_CONTENT__\s*%})')
+# The characters the SFC regex match case insensitively to the letters of the tags, while
+# they don't lowercase to them. Only 'İ' changes length when lowercased
+_SFC_CASE_FOLD = {0x130: "i", 0x131: "i", 0x17f: "s"}
 
 RE_IS_URL = re.compile(r'^(http|https)://')
 
+# The url() of a stylesheet, quoted or not
+RE_CSS_URL = re.compile(r'url\(\s*(?:"([^"]*)"|\'([^\']*)\'|([^\'"\s)]*))\s*\)', re.IGNORECASE)
+# The at-rules only valid at the start of a stylesheet
+RE_CSS_HEAD_RULES = re.compile(r'@(?:import|charset)\b', re.IGNORECASE)
+# The urls that don't depend on the location of the stylesheet: absolute, with a scheme, data, fragments
+RE_CSS_ABSOLUTE_URL = re.compile(r'^(?:/|#|[a-z][a-z0-9+.-]*:)', re.IGNORECASE)
+
 
 def is_https_string(url):
   '''
@@ -63,19 +90,118 @@ def meta_tag(name, value):
     '''
     return meta_tag_custom('name', name, value);
 
+def _skip_spaces(content, i):
+    ''' Return the position of the first non whitespace character from i '''
+    n = len(content)
+    while i < n and content[i].isspace():
+        i += 1
+    return i
+
+def _closing_tags(lower, name):
+    '''
+    Return the start of the closing tags, ie: '</script >', as the SFC regex match them
+    :param lower: the lowercased content
+    :returns list: in order
+    '''
+    tag = "</" + name
+    positions = []
+    i = lower.find(tag)
+    while i != -1:
+        if lower.startswith(">", _skip_spaces(lower, i + len(tag))):
+            positions.append(i)
+        i = lower.find(tag, i + 1)
+    return positions
+
+def _sfc_template(content, lower):
+    '''
+    Return the template of a SFC, like RE_SFC_TEMPLATE
+    :returns string: None when there is no template
+    '''
+    i = lower.find("<template")
+    while i != -1:
+        j = _skip_spaces(lower, i + len("<template"))
+        if lower.startswith(">", j):
+            start = j + 1
+            if content.startswith("\n", start):
+                start += 1
+            # Without a closing tag after the first opening one, there is none after the others
+            closings = _closing_tags(lower, "template")
+            i = bisect.bisect_left(closings, start)
+            return content[start:closings[i]] if i < len(closings) else None
+        i = lower.find("<template", i + 1)
+    return None
+
+def _sfc_block(content, lower, name):
+    '''
+    Return the props and the body of the first script or style block, like RE_SFC_SCRIPT and RE_SFC_STYLE
+    without their backtracking. The props run to the end of the line of the opening tag when a '>'
+    follows it, or else to the last '>' of the line followed by a closing tag
+    :returns tuple: (props, body), or None when there is no block
+    '''
+    closings = _closing_tags(lower, name)
+    if not closings:
+        return None
+    last = closings[-1]
+    tag = "<" + name
+    failed_line_end = -1
+    i = lower.find(tag)
+    while i != -1:
+        props_start = _skip_spaces(content, i + len(tag))
+        # The tags on the line of a tag without a block have none either
+        if props_start > failed_line_end:
+            line_end = content.find("\n", props_start)
+            if line_end == -1:
+                line_end = len(content)
+            gt = _skip_spaces(content, line_end)
+            props_end = line_end
+            if gt >= last or not content.startswith(">", gt):
+                gt = props_end = content.rfind(">", props_start, min(line_end, last))
+            if gt != -1:
+                props = content[props_start:props_end]
+                start = gt + 1
+                if content.startswith("\n", start):
+                    start += 1
+                return props, content[start:closings[bisect.bisect_left(closings, start)]]
+            failed_line_end = line_end
+        i = lower.find(tag, i + 1)
+    return None
+
 def destruct_sfc(content):
     '''
-    To destruct a single file component into template, script, style
+    To destruct a single file component into template, script, style.
+    The tags are found with str.find instead of the regex and their backtracking,
+    with the same output as destruct_sfc_regex()
     :param: string content 
     :returns: tuple - (Bool, {template, script, style, script_props, style_props})
     '''
-    s_template = re.search(RE_SFC_TEMPLATE, content)
-    s_script = re.search(RE_SFC_SCRIPT, content)
-    s_style = re.search(RE_SFC_STYLE, content)
+    # Same length as content, so the positions match
+    lower = content.translate(_SFC_CASE_FOLD).lower()
+    template = _sfc_template(content, lower)
+    if template is None:
+        return (False, {"template": content, "script": None, "style": None, "script_props": "", "style_props": ""})
+    script = _sfc_block(content, lower, "script")
+    style = _sfc_block(content, lower, "style")
+    return (True, {
+        "template": template,
+        "script": script[1].replace("\"","'") if script else None,
+        "script_props": script[0] if script else None,
+        "style": style[1] if style else None,
+        "style_props": style[0] if style else None,
+    })
 
+def destruct_sfc_regex(content):
+    '''
+    To destruct a single file component into template, script, style, with the regex.
+    The reference of destruct_sfc()
+    :param: string content 
+    :returns: tuple - (Bool, {template, script, style, script_props, style_props})
+    '''
+    s_template = re.search(RE_SFC_TEMPLATE, content)
     if s_template:
+        s_script = re.search(RE_SFC_SCRIPT, content)
+        s_style = re.search(RE_SFC_STYLE, content)
         return (True, {
-            "template": s_template.group(1) if s_template else content,
+            "template": s_template.group(1),
             "script": s_script.group(2).replace("\"","'") if s_script else None,
             "script_props": s_script.group(1) if s_script else None,
             "style": s_style.group(2) if s_style else None,
@@ -84,25 +210,92 @@ def destruct_sfc(content):
     else:
         return (False, {"template": content, "script": None, "style": None, "script_props": "", "style_props": ""})
 
+def find_page_tags(content):
+    '''
+    Find the extends tag and the __PAGE_CONTENT__ block of a page, in one scan of its tags.
+    Gives the same output as find_page_tags_regex()
+    :param content: string
+    :returns tuple: (the extends tag, the template it extends, bool if the block is found).
+                    The tag and the template are None when there is no extends tag
+    '''
+    extends = None
+    block = False
+    for m in RE_PAGE_TAGS.finditer(content):
+        if m.group(1) is None:
+            block = True
+        elif extends is None:
+            end = content.find("%}", m.end())
+            template = content[m.end():end].rstrip() if end != -1 else None
+            # The template name is on one line
+            if template is not None and "\n" not in template:
+                extends = (content[m.start():end + 2], template)
+        if block and extends is not None:
+            break
+    if extends is None:
+        return None, None, block
+    return extends[0], extends[1], block
+
+def find_page_tags_regex(content):
+    '''
+    Find the extends tag and the __PAGE_CONTENT__ block of a page, with the regex.
+    The reference of find_page_tags()
+    :param content: string
+    :returns tuple: (the extends tag, the template it extends, bool if the block is found)
+    '''
+    extends = re.search(RE_EXTENDS, content)
+    block = re.search(RE_BLOCK_BODY, content) is not None
+    if extends is None:
+        return None, None, block
+    return extends.group(0), extends.group(1), block
+
+@functools.lru_cache(maxsize=4096)
+def compile_path(key):
+    '''
+    Split a dotted key into the tuple of its keys, once per key.
+    Digits are list indexes. ie: 'key.key2.0.keyx' -> ('key', 'key2', 0, 'keyx')
+    :param key: string
+    :returns tuple:
+    '''
+    return tuple(int(k) if k.isdigit() else k for k in key.split('.'))
+
+def get_path(data, key, default=None):
+    '''
+    Access nested dicts and lists via dot notation, without wrapping them in a dictdot.
+    ie: get_path(meta, 'key.key2.0.keyx')
+    :param data: dict
+    :param key: string, the dotted key, or a tuple from compile_path()
+    :param default: returned when the key doesn't exist
+    '''
+    try:
+        if key.__class__ is not tuple:
+            if "." not in key:
+                return data[key]
+            key = compile_path(key)
+        for k in key:
+            data = data[k]
+        return data
+    except (TypeError, KeyError, IndexError):
+        return default
+
 class dictdot(dict):
     '''
     A dict extension that allows dot notation to access the data.
-    ie: dict.get('key.key2.0.keyx'). Still can use dict[key1][k2]
+    ie: dict.get('key.key2.0.keyx'). Still can use dict[key1][k2], or dict.key1 
     To create: dictdot(my)
     '''
     def get(self, key, default=None):
         ''' access data via dot notation '''
+        return get_path(self, key, default)
+
+    def __getattr__(self, key):
+        ''' 
+        Attribute access to the keys, so templates get them without the failed
+        attribute lookup first. Dict attributes (ie: items) take precedence
+        '''
         try:
-            val = self
-            if "." not in key:
-                return self[key]
-            for k in key.split('.'):
-                if k.isdigit():
-                    k = int(k)
-                val = val[k]
-            return val
-        except (TypeError, KeyError, IndexError) as e:
-            return default
+            return self[key]
+        except KeyError:
+            raise AttributeError(key)
 
 def load_conf(yml_file, conf={}):
     '''
@@ -143,9 +336,9 @@ def merge_dicts(dict1, dict2):
 
 def convert_scss_to_css(content):
     '''
-    Convert simple scss to css. Usually for SFC
+    Convert simple scss to css. Usually for SFC. The css is cached, see scss_ext
     '''
-    return SCSS().compile_string(content)
+    return scss_ext.compile_string(content)[0]
 
 def convert_assets_items_to_dict(assets, attributes=""):
   '''
@@ -159,41 +352,318 @@ def convert_assets_items_to_dict(assets, attributes=""):
         b.append({"url": a, "attributes": attributes} if not isinstance(a, (dict,)) else a)
   return b
 
-def copy_static_dir(src, dst, cb_checksum=None, cb_extensions=(None,), cb_ignores=[], _recurse=None):
+def rebase_css_urls(content, src_dir, dest_dir):
+    '''
+    Rewrite the relative url() of a stylesheet moved from src_dir to dest_dir,
+    so they point to the same files. ie: url(./images/bg.svg) of main.css moved to
+    bundles__/ becomes url(../images/bg.svg)
+    :param content: the css
+    :param src_dir: the dir of the stylesheet, relative to the static dir
+    :param dest_dir: the dir it is moved to, relative to the static dir
+    :returns string:
+    '''
+    def rebase(m):
+        quote, url = next((q, g) for q, g in zip(('"', "'", ""), m.groups()) if g is not None)
+        if not url or RE_CSS_ABSOLUTE_URL.match(url):
+            return m.group(0)
+        # The query and fragment are kept as is
+        path = re.split(r'[?#]', url, 1)[0]
+        suffix = url[len(path):]
+        path = posixpath.relpath(posixpath.normpath(posixpath.join(src_dir, path)), dest_dir or ".")
+        return "url(%s%s%s%s)" % (quote, path, suffix, quote)
+
+    return RE_CSS_URL.sub(rebase, content)
+
+def copy_static_dir(src, dst, cb_checksum=None, cb_extensions=(None,), cb_ignores=[], cb_manifest=None, workers=None, link=False, transform=None):
     '''
     To copy a src directory to dst directory
-    Files or folder starting with _ or . will not be copied over
+    Files or folder starting with _ or . will not be copied over.
+    The directory is scanned first, then the files are copied in a thread pool
+    :param cb_checksum: string, the cache busting checksum. Or a function returning the checksum of a file
+    :param cb_manifest: dict, to be filled with the cache busted files. ie: {'main.js': 'main.4fe1a2b3.js'}
+    :param workers: int, the number of threads. None for the default of ThreadPoolExecutor
+    :param link: bool, to hardlink the files instead of copying them when possible
+    :param transform: function returning the function to transform the content of a file, or None. ie: minify
+    :returns list: the files in dst
     '''
-    try:
-        names = os.listdir(src)
-    except OSError as e:
-        raise DistutilsFileError("error listing files in '%s': %s" % (src, e.strerror))
-
-    mkpath(dst)
-    outputs = []
-    base_src = src if _recurse is None else _recurse
-
-    for n in names:
-        src_name = os.path.join(src, n)
-        base_src_name = src_name.replace(base_src, "").lstrip("/")
-        dst_name = os.path.join(dst, n)
-        
-        # skip files and folders starting with . or _ or a symlink
-        if n.startswith(('.', '_')) or os.path.islink(src_name):
-            continue
+    files = []
+    dirs = [(src, dst)]
+    while dirs:
+        src_dir, dst_dir = dirs.pop()
+        try:
+            entries = list(os.scandir(src_dir))
+        except OSError as e:
+            raise DistutilsFileError("error listing files in '%s': %s" % (src_dir, e.strerror))
+        os.makedirs(dst_dir, exist_ok=True)
+
+        for entry in entries:
+            # skip files and folders starting with . or _ or a symlink
+            if entry.name.startswith(('.', '_')) or entry.is_symlink():
+                continue
+            dst_name = os.path.join(dst_dir, entry.name)
+            if entry.is_dir():
+                dirs.append((entry.path, dst_name))
+                continue
+            base_src_name = os.path.relpath(entry.path, src)
+            cache_busting = cb_checksum \
+                and entry.name.endswith(cb_extensions) \
+                and base_src_name not in cb_ignores
+            files.append((entry.path, dst_name, base_src_name, cache_busting))
 
+    def _copy(item):
+        src_name, dst_name, base_src_name, cache_busting = item
         # Apply cache busting
-        if cb_checksum is not None \
-            and len(cb_checksum) > 0 \
-            and os.path.isfile(src_name) \
-            and n.endswith(cb_extensions) \
-            and base_src_name not in cb_ignores:
-            dst_name = insert_checksum_in_filepath(dst_name, cb_checksum)
-
-        if os.path.isdir(src_name):
-            outputs.extend(copy_static_dir(src_name, dst_name, cb_checksum, cb_extensions, cb_ignores, src))
-        else:
-            copy_file(src_name, dst_name)
-            outputs.append(dst_name)
+        if cache_busting:
+            checksum = cb_checksum(src_name) if callable(cb_checksum) else cb_checksum
+            dst_name = insert_checksum_in_filepath(dst_name, checksum)
+        copy_file(src_name, dst_name, link, transform(src_name) if transform else None)
+        return dst_name
+
+    outputs = map_threads(_copy, files, workers)
+    if cb_manifest is not None:
+        for (src_name, dst_name, base_src_name, cache_busting), output in zip(files, outputs):
+            if cache_busting:
+                cb_manifest[base_src_name] = os.path.relpath(output, dst)
+    return outputs
+
+def copy_dir(src, dst, workers=None, link=False):
+    '''
+    To copy all the files of a src directory to dst directory
+    :param workers: int, the number of threads. None for the default of ThreadPoolExecutor
+    :param link: bool, to hardlink the files instead of copying them when possible
+    :returns list: the files in dst
+    '''
+    files = []
+    for root, _, names in os.walk(src):
+        dst_dir = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(dst_dir, exist_ok=True)
+        for n in names:
+            files.append((os.path.join(root, n), os.path.normpath(os.path.join(dst_dir, n))))
+
+    def _copy(item):
+        copy_file(item[0], item[1], link)
+        return item[1]
+
+    return map_threads(_copy, files, workers)
+
+def snapshot_files(dirs):
+    '''
+    Return the size and mtime of all the files in some directories
+    :param dirs: list of directories
+    :returns dict: {filepath: (size, mtime_ns)}
+    '''
+    snapshot = {}
+    for d in dirs:
+        for root, _, names in os.walk(d):
+            for n in names:
+                filepath = os.path.join(root, n)
+                try:
+                    st = os.stat(filepath)
+                except OSError:
+                    continue
+                snapshot[filepath] = (st.st_size, st.st_mtime_ns)
+    return snapshot
+
+def diff_snapshots(old, new):
+    '''
+    Return the files added, changed or removed between two snapshot_files
+    :param old: dict, the previous snapshot
+    :param new: dict, the current snapshot
+    :returns list: the file paths, sorted
+    '''
+    changed = {f for f, stat in new.items() if old.get(f) != stat}
+    changed.update(f for f in old if f not in new)
+    return sorted(changed)
+
+def map_threads(fn, items, workers=None, chunk_size=64):
+    '''
+    Apply a function to the items in a thread pool.
+    Items are sent to the threads by chunks, to keep the overhead low for small tasks
+    :param fn: function
+    :param items: list
+    :param workers: int, the number of threads. None for the default of ThreadPoolExecutor
+    :param chunk_size: int, the number of items per task
+    :returns list: the results, in the order of the items
+    '''
+    if len(items) <= chunk_size or workers == 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(workers) as executor:
+        chunks = executor.map(lambda chunk: [fn(item) for item in chunk], chunk_list(items, chunk_size))
+        return [result for chunk in chunks for result in chunk]
+
+def _tmp_filepath(filepath):
+    ''' Return a temp file path next to filepath, to write it atomically '''
+    dirname, basename = os.path.split(filepath)
+    return os.path.join(dirname, ".%s.%s.tmp" % (basename, gen_random_str()))
+
+def write_file(filepath, content):
+    '''
+    To write a file only if its content changed, so unchanged files keep their mtime.
+    The content is written to a temp file then renamed, so the file is never half written
+    :param filepath: string
+    :param content: string or bytes
+    :returns bool: True if the file was written
+    '''
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    try:
+        if os.path.getsize(filepath) == len(data):
+            with open(filepath, "rb") as f:
+                if f.read() == data:
+                    return False
+    except OSError:
+        pass
+    tmp_file = _tmp_filepath(filepath)
+    with open(tmp_file, "wb") as f:
+        f.write(data)
+    os.replace(tmp_file, filepath)
+    return True
+
+def replace_file(tmp_file, filepath):
+    '''
+    To move a file written in full, ie: streamed, in place of filepath only if its content changed.
+    The temp file is deleted otherwise, so unchanged files keep their mtime
+    :param tmp_file: string, in the same dir as filepath
+    :param filepath: string
+    :returns bool: True if the file was replaced
+    '''
+    try:
+        if filecmp.cmp(tmp_file, filepath, shallow=False):
+            os.remove(tmp_file)
+            return False
+    except OSError:
+        pass
+    os.replace(tmp_file, filepath)
+    return True
+
+def copy_file(src, dst, link=False, transform=None):
+    '''
+    To copy a file only if it changed, by size and mtime. The mtime is kept.
+    The file is copied to a temp file then renamed, so it's never half written
+    :param src: string
+    :param dst: string
+    :param link: bool, to hardlink the file instead, when src and dst are on the same filesystem
+    :param transform: function to transform the text content, ie: minify.
+                      The size changes then, the file is only transformed again when its mtime changes
+    :returns bool: True if the file was copied
+    '''
+    try:
+        src_stat = os.stat(src)
+        dst_stat = os.stat(dst)
+        if src_stat.st_mtime_ns == dst_stat.st_mtime_ns and (transform or src_stat.st_size == dst_stat.st_size):
+            return False
+    except OSError:
+        pass
+    tmp_file = _tmp_filepath(dst)
+    if transform:
+        with open(src, encoding="utf-8") as f:
+            content = transform(f.read())
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(content)
+        shutil.copystat(src, tmp_file)
+        os.replace(tmp_file, dst)
+        return True
+    if link:
+        try:
+            os.link(src, tmp_file)
+            os.replace(tmp_file, dst)
+            return True
+        except OSError:
+            pass
+    _copy_file_data(src, tmp_file)
+    shutil.copystat(src, tmp_file)
+    os.replace(tmp_file, dst)
+    return True
 
-    return outputs
\ No newline at end of file
+def _copy_file_data(src, dst):
+    '''
+    Copy the content of a file. With os.copy_file_range the copy is done in the kernel,
+    and can share the blocks on filesystems supporting reflinks
+    '''
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                size = os.fstat(fsrc.fileno()).st_size
+                copied = 0
+                while copied < size:
+                    n = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                    if n == 0:
+                        break
+                    copied += n
+            if copied == size:
+                return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+def gzip_bytes(data):
+    '''
+    Gzip bytes. The mtime of the header is 0, so the same data gives the same bytes
+    '''
+    buf = BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+def get_compressors(use_brotli=True):
+    '''
+    Return the compressors of the precompressed files, by file suffix
+    :param use_brotli: bool, to include brotli when it is installed
+    :returns dict: ie: {".gz": gzip_bytes, ".br": brotli.compress}
+    '''
+    compressors = {".gz": gzip_bytes}
+    if use_brotli and brotli is not None:
+        compressors[".br"] = brotli.compress
+    return compressors
+
+def precompress_file(filepath, compressors, min_size=0, skipped=None):
+    '''
+    Write the compressed files of a file next to it, ie: index.html.gz.
+    A compressed file is only written when the file changed, by mtime, and when
+    it is smaller than the file. Otherwise an existing one is deleted
+    :param filepath: string
+    :param compressors: dict of suffix and function compressing bytes, from get_compressors()
+    :param min_size: int, files smaller than this are not compressed
+    :param skipped: dict of the compressed files not written because they were not smaller,
+                    and the hash of the file then. These are not compressed again until the
+                    file changes. Updated with the ones skipped now
+    :returns list: the compressed files written
+    '''
+    st = os.stat(filepath)
+    written = []
+    data = None
+    file_hash = None
+    for suffix, compress in compressors.items():
+        dest_file = filepath + suffix
+        try:
+            if os.stat(dest_file).st_mtime_ns == st.st_mtime_ns:
+                continue
+        except OSError:
+            pass
+        if st.st_size < min_size:
+            if os.path.isfile(dest_file):
+                os.remove(dest_file)
+            continue
+        if data is None:
+            with open(filepath, "rb") as f:
+                data = f.read()
+            if skipped is not None:
+                file_hash = hash_bytes(data)
+        if skipped is not None and skipped.get(dest_file) == file_hash:
+            continue
+        compressed = compress(data)
+        if len(compressed) >= st.st_size:
+            if os.path.isfile(dest_file):
+                os.remove(dest_file)
+            if skipped is not None:
+                skipped[dest_file] = file_hash
+            continue
+        if skipped is not None:
+            skipped.pop(dest_file, None)
+        tmp_file = _tmp_filepath(dest_file)
+        with open(tmp_file, "wb") as f:
+            f.write(compressed)
+        # The mtime of the file, to know when it changes
+        os.utime(tmp_file, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp_file, dest_file)
+        written.append(dest_file)
+    return written
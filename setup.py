@@ -48,6 +48,11 @@ setup(
     include_package_data=True,
     packages=find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests"]),
     install_requires=install_requires,
+    extras_require={
+        "minify": ["rcssmin", "rjsmin"],
+        "brotli": ["brotli"],
+        "ijson": ["ijson>=3.1"]
+    },
     keywords=['static site generator'],
     platforms='any',
     classifiers=[
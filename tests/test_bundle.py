@@ -0,0 +1,75 @@
+"""
+Tests of the bundling of the page assets
+
+    python -m pytest tests
+"""
+
+import os
+import re
+import glob
+import shutil
+import yaml
+
+from mambo import Mambo, utils
+
+SKEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mambo", "skel")
+
+
+def build_site(root_dir, stylesheets, files):
+    '''
+    Build the skel with bundle_assets, and the global stylesheets
+    :param stylesheets: list of the global stylesheets
+    :param files: dict of the static files to add, by path
+    :returns string: the build dir
+    '''
+    shutil.copytree(SKEL_DIR, root_dir)
+    conf_file = os.path.join(root_dir, "mambo.yml")
+    with open(conf_file) as f:
+        conf = yaml.safe_load(f)
+    conf["build"]["bundle_assets"] = True
+    conf["build"]["cache_busting"]["enable"] = False
+    conf["build"]["minify_html"] = False
+    conf["globals"]["assets"]["stylesheets"] = stylesheets
+    with open(conf_file, "w") as f:
+        yaml.safe_dump(conf, f)
+    for path, content in files.items():
+        filepath = os.path.join(root_dir, "static", path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "w") as f:
+            f.write(content)
+    Mambo(root_dir, {"build": "build"}).build()
+    return os.path.join(root_dir, ".build")
+
+def bundles(build_dir):
+    return glob.glob(os.path.join(build_dir, "static", "bundles__", "*.css"))
+
+
+def test_rebase_css_urls():
+    css = "a{b:url(./img/a.svg)} c{d:url('../up.png?v=1')} e{f:url(data:image/png;base64,AA==) url(/x.png) url(#g)}"
+    assert utils.rebase_css_urls(css, "css", "bundles__") == (
+        "a{b:url(../css/img/a.svg)} c{d:url('../up.png?v=1')} "
+        "e{f:url(data:image/png;base64,AA==) url(/x.png) url(#g)}")
+
+def test_bundle_relative_url(tmp_path):
+    build_dir = build_site(str(tmp_path / "site"), ["main.css", "css/theme.css"], {
+        "css/theme.css": "body { background-image: url(./images/bg.svg); }\n",
+        "css/images/bg.svg": "<svg xmlns='http://www.w3.org/2000/svg'></svg>\n",
+    })
+    files = bundles(build_dir)
+    assert files
+    for bundle in files:
+        with open(bundle) as f:
+            content = f.read()
+        urls = re.findall(r'url\(([^)]*)\)', content)
+        assert urls == ["../css/images/bg.svg"]
+        assert os.path.isfile(os.path.join(os.path.dirname(bundle), urls[0]))
+
+def test_bundle_skips_import(tmp_path):
+    build_dir = build_site(str(tmp_path / "site"), ["main.css", "css/theme.css"], {
+        "css/theme.css": "@import url(base.css);\nbody { color: red; }\n",
+        "css/base.css": "p { color: blue; }\n",
+    })
+    assert bundles(build_dir) == []
+    with open(os.path.join(build_dir, "index.html")) as f:
+        html = f.read()
+    assert "css/theme.css" in html and "main.css" in html
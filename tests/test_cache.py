@@ -0,0 +1,26 @@
+"""
+Tests of the dependencies found in the templates
+
+    python -m pytest tests
+"""
+
+import pytest
+from jinja2 import Environment
+
+from mambo.cache import find_dependencies
+
+CASES = [
+    ("{{ data.cars }}", {"data:cars"}),
+    ("{{ data['items'] }}", {"data:items"}),
+    ("{% for name, d in data.items() %}{% endfor %}", {"data:*"}),
+    ("{{ data.keys() | list }}", {"data:*"}),
+    ("{{ data.get('cars.models.0') }}", {"data:cars"}),
+    ("{{ data.get(name) }}", {"data:*"}),
+    ("{{ data.cars.get('items') }}", {"data:cars"}),
+    ("{{ data }}", {"data:*"}),
+]
+
+
+@pytest.mark.parametrize("source, deps", CASES)
+def test_data_dependencies(source, deps):
+    assert find_dependencies(Environment().parse(source)) == deps
@@ -0,0 +1,50 @@
+"""
+Tests of the collection pages
+
+    python -m pytest tests
+"""
+
+import os
+import shutil
+
+from mambo import Mambo
+
+SKEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mambo", "skel")
+
+PAGINATION = "{{ page.pagination.page }}|{{ page.pagination.first_url }}|{{ page.pagination.prev_url }}|{{ page.pagination.next_url }}"
+
+
+def build_blog(root_dir, per_page):
+    '''
+    Build the skel, with the blog paginated
+    :returns string: the build dir
+    '''
+    shutil.copytree(SKEL_DIR, root_dir)
+    os.remove(os.path.join(root_dir, "content", "blog", "index.html"))
+    blog_file = os.path.join(root_dir, "pages", "blog.html")
+    with open(blog_file) as f:
+        content = f.read()
+    content = content.replace("    url: blog/{url}\n", "    url: blog/{url}\n    per_page: %s\n" % per_page)
+    content = content.replace("{% endfor %}", "{% endfor %}<p id=pagination>" + PAGINATION + "</p>")
+    with open(blog_file, "w") as f:
+        f.write(content)
+    Mambo(root_dir, {"build": "build"}).build()
+    return os.path.join(root_dir, ".build")
+
+def pagination(build_dir, url):
+    with open(os.path.join(build_dir, url.lstrip("/"), "index.html")) as f:
+        html = f.read()
+    return html.split("<p id=pagination>")[1].split("</p>")[0]
+
+
+def test_first_index_page_at_page_url(tmp_path):
+    build_dir = build_blog(str(tmp_path / "site"), 1)
+    assert pagination(build_dir, "/blog") == "1|/blog|None|/blog/page/2"
+    assert pagination(build_dir, "/blog/page/2") == "2|/blog|/blog|None"
+    assert not os.path.exists(os.path.join(build_dir, "blog", "page", "1"))
+    assert not os.path.exists(os.path.join(build_dir, "blog", "page", "3"))
+
+def test_single_index_page(tmp_path):
+    build_dir = build_blog(str(tmp_path / "site"), 10)
+    assert pagination(build_dir, "/blog") == "1|/blog|None|None"
+    assert not os.path.exists(os.path.join(build_dir, "blog", "page"))
@@ -0,0 +1,77 @@
+"""
+Tests of the fast html minifier, against htmlmin
+
+HtmlMinifier keeps the tags as is, htmlmin rewrites the attributes, the pages are compared
+by their tags, attributes and text.
+
+    python -m pytest tests
+"""
+
+import threading
+from html.parser import HTMLParser
+
+import pytest
+
+from mambo import minify
+
+CASES = [
+    "<div>\n   <span>a</span>\n   <span>b</span>\n</div>",
+    "<p>\n  <a title=\"a  >  b\"\n     href=\"c\">x   y</a>\n</p>",
+    "<p title=\"a > b\">  x  </p>\n<p>y</p>",
+    "<a title='x\n  > y'>k</a>\n<p>  z  </p>",
+    "<p>a < b\n\n   and   c</p>\n<div>\n  z  </div>",
+    "<p>1 <2 and 3> 2</p>\n<p>\n 4  <  5 </p>",
+    "<input value=\"<b>  x\"\n  >  y",
+    "<p>\n<pre>\n  a   b\n</pre>\n  c   d </p>",
+    "<div\n  class=\"a\"\n  data-x='\"'\n>\n  t  </div>",
+]
+
+
+class Events(HTMLParser):
+    ''' The tags, attributes and text of some html '''
+
+    def __init__(self, html):
+        super().__init__(convert_charrefs=True)
+        self.events = []
+        self.feed(html)
+        self.close()
+
+    def handle_starttag(self, tag, attrs):
+        self.events.append(("start", tag, sorted(attrs)))
+
+    def handle_endtag(self, tag):
+        self.events.append(("end", tag))
+
+    def handle_data(self, data):
+        if self.events and self.events[-1][0] == "data":
+            self.events[-1] = ("data", self.events[-1][1] + data)
+        else:
+            self.events.append(("data", data))
+
+
+@pytest.mark.parametrize("html", CASES)
+def test_html_minifier(html):
+    assert Events(minify.HtmlMinifier().minify(html)).events == Events(minify.minify_html(html)).events
+
+@pytest.mark.parametrize("html", CASES)
+def test_html_minifier_cached(html):
+    minifier = minify.HtmlMinifier()
+    assert minifier.minify(html) == minifier.minify(html)
+    assert minifier.minify(html + "\n<p>x</p>") == minifier.minify(html) + " <p>x</p>"
+
+def test_html_minifier_threads():
+    pages = ["\n".join(CASES[i:] + CASES[:i]) for i in range(len(CASES))]
+    expected = [minify.HtmlMinifier().minify(page) for page in pages]
+    # A small cache, cleared while the threads read it
+    minifier = minify.HtmlMinifier(cache_size=5)
+    results = []
+
+    def run():
+        results.append([minifier.minify(page) for page in pages * 50])
+
+    threads = [threading.Thread(target=run) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [expected * 50] * 8
@@ -0,0 +1,97 @@
+"""
+Tests of the SFC and layout tokenizer
+
+destruct_sfc and find_page_tags find the tags of the page without the backtracking of the regex,
+they must give the same output as the regex, destruct_sfc_regex and find_page_tags_regex,
+on the edge cases and on random pages.
+
+    python -m pytest tests
+"""
+
+import random
+import pytest
+
+from mambo import utils
+from mambo.utils import destruct_sfc_regex, find_page_tags_regex
+
+CASES = [
+    "",
+    "<div>no template</div>",
+    "<template><p>x</p></template>",
+    "<template>\n<p>x</p>\n</template>\n<script>\nvar a = \"b\";\n</script>\n<style>\n.a{}\n</style>",
+    "<TEMPLATE >\nx</Template >\n<SCRIPT type=\"module\" >\nx</SCRIPT>\n<Style scoped>\ny</style  >",
+    "<template>\n<script>inline()</script>\n</template>\n<script>\nmain()\n</script>",
+    "<template>x</template><script>a</script><script>b</script>",
+    "<template>x</template><script a=1>b</script> <i>c</i>",
+    "<template>x</template>\n<script\ntype='x'>\nb</script>",
+    "<template>x</template>\n<script type='x'\n>\nb</script>",
+    "<template>x</template>\n<script type='x'>\n\n>b</script>",
+    "<template>x</template>\n<script type='x'>b",
+    "<template>x</template>\n<script>b</script>\n<script>c",
+    "<template>x</template>\n<scripts>b</script>",
+    "<template>x</template>\n<script>b</script\n>",
+    "<template>x</template>\n<style>a</style>\n<style>b</style>",
+    "<template>x</template>\n<style lang=scss>\n</style>",
+    "<template\n>x</template\n>",
+    "<templates>x</template><template>y</template>",
+    "<template>x<template>y</template></template>",
+    "<template>x",
+    "<template>İx</template><script>a</script>",
+    "<template>x</template><ſcript>a</SCRİPT><scrıpt>b</script>",
+    "{% extends 'a.html' %}",
+    "{%extends 'a.html'%}{%block __PAGE_CONTENT__%}{%endblock%}",
+    "{% extends\n'a.html'\n%}",
+    "{% extends 'a.html\n' %}",
+    "{% extends 'a\n.html' %} {% extends 'b.html' %}",
+    "{% extendsx 'a' %}{% extends 'b' %}",
+    "{% extends %}",
+    "{% block  __PAGE_CONTENT__ %}",
+    "{% block __PAGE_CONTENT__x %}",
+    "{% block __PAGE_CONTENTS__ %}{% block __PAGE_CONTENT__ %}",
+    "{% if a %}{% block __PAGE_CONTENT__ %}{% endblock %}{% endif %}{% extends 'z' %}",
+    "{% extends 'a' %",
+    "{{ x }} {% extends \"a\" %}{% extends 'b' %}",
+]
+
+# The pieces of the random pages
+FRAGMENTS = [
+    "<template>", "</template>", "<TEMPLATE >", "</template >", "<template\n>",
+    "<script>", "</script>", "<script type='x'>", "<script\n", "</SCRIPT\n>", "<scripts>",
+    "<style>", "</style>", "<style scoped >", "<STYLE", "</style>",
+    "{% extends 'a.html' %}", "{%extends \"b\"%}", "{% extends\n", "{% block __PAGE_CONTENT__ %}",
+    "{%block __PAGE_CONTENT__%}", "{% endblock %}", "{% block x %}", "%}", "{%",
+    ">", "<", "\n", " ", "\t", "\"", "'", "a", "body", "x > y", "İ",
+]
+
+
+def random_pages(count, seed):
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(0, 30))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("content", CASES)
+def test_destruct_sfc(content):
+    assert utils.destruct_sfc(content) == destruct_sfc_regex(content)
+
+@pytest.mark.parametrize("content", CASES)
+def test_find_page_tags(content):
+    assert utils.find_page_tags(content) == find_page_tags_regex(content)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_pages(seed):
+    for content in random_pages(1000, seed):
+        assert utils.destruct_sfc(content) == destruct_sfc_regex(content), content
+        assert utils.find_page_tags(content) == find_page_tags_regex(content), content
+
+def test_destruct_sfc_parts():
+    is_sfc, parts = utils.destruct_sfc(CASES[3])
+    assert is_sfc
+    assert parts["template"] == "<p>x</p>\n"
+    assert parts["script"] == "var a = 'b';\n"
+    assert parts["style"] == ".a{}\n"
+
+def test_find_page_tags_extends():
+    tag, template, has_block = utils.find_page_tags("{%extends 'a.html'%}{%block __PAGE_CONTENT__%}{%endblock%}")
+    assert tag == "{%extends 'a.html'%}"
+    assert template == "'a.html'"
+    assert has_block
@@ -0,0 +1,51 @@
+"""
+Tests of the file utils
+
+    python -m pytest tests
+"""
+
+import os
+
+from mambo import utils
+
+
+def write(filepath, content, mtime_ns):
+    with open(filepath, "w") as f:
+        f.write(content)
+    os.utime(filepath, ns=(mtime_ns, mtime_ns))
+
+
+def test_copy_file_transform_same_size(tmp_path):
+    src, dst = str(tmp_path / "a.js"), str(tmp_path / "b.js")
+    write(src, "abc", 10 ** 18)
+    calls = []
+
+    def transform(content):
+        calls.append(content)
+        return content.upper()
+
+    assert utils.copy_file(src, dst, transform=transform)
+    assert not utils.copy_file(src, dst, transform=transform)
+    assert calls == ["abc"]
+    with open(dst) as f:
+        assert f.read() == "ABC"
+
+    write(src, "abd", 10 ** 18 + 1)
+    assert utils.copy_file(src, dst, transform=transform)
+    with open(dst) as f:
+        assert f.read() == "ABD"
+
+def test_copy_file_without_transform(tmp_path):
+    src, dst = str(tmp_path / "a.js"), str(tmp_path / "b.js")
+    write(src, "abc", 10 ** 18)
+    assert utils.copy_file(src, dst, transform=lambda c: c.strip("c"))
+    # The transformed file has another size, it's copied again without the transform
+    assert utils.copy_file(src, dst)
+    assert not utils.copy_file(src, dst)
+    with open(dst) as f:
+        assert f.read() == "abc"
+
+def test_diff_snapshots():
+    old = {"a": (1, 1), "b": (1, 1), "c": (1, 1)}
+    new = {"a": (1, 1), "b": (1, 2), "d": (1, 1)}
+    assert utils.diff_snapshots(old, new) == ["b", "c", "d"]